@@ -0,0 +1,492 @@
+"""
+Deterministic headless frame benchmark.
+
+Flies fixed camera paths through the generate_test_wad.py map and
+synthetic large maps, and reports per-system time, frame-time
+percentiles and terminal output bytes. Results are written as JSON so
+runs can be compared between commits:
+
+    python3 benchmark.py --out before.json
+    ... change code ...
+    python3 benchmark.py --out after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+from src.engine import GameEngine
+from src.ecs.world import World
+from src.ecs.components import Transform, Motion, PhysicsMode, PhysicsModeType, Body, Stats
+from src.utils.math_core import Vector3, PI, get_ray_table
+from src.systems.physics_sys import physics_system
+from src.systems.collision_sys import sync_spatial_hash
+from src.utils.raycast import RAY_WALLS, RAY_ALL, select_caster, cast_columns
+from generate_test_wad import generate_standard_test_wad
+
+# ----------------------------------------------------------------------
+# Scenes: build(engine) sets up the map, path(engine, i) moves the camera
+# ----------------------------------------------------------------------
+def build_test_wad(engine):
+    # The level is fully loaded by init_game(), so the WAD can go right after
+    with tempfile.TemporaryDirectory(prefix="bench_wad_") as tmp:
+        path = os.path.join(tmp, "DOOM1.WAD")
+        generate_standard_test_wad(path)
+        engine.wad_path = path
+        engine.init_game()
+
+def build_synthetic(size, walls, seed=1):
+    def build(engine):
+        engine.spawn_player()
+        world = engine.world
+        world.init_map(size, size, [], [], [])
+        for name in ("STARTAN3", "COMPTALL", "BIGDOOR1", "ROCK1", "METAL2"):
+            world.register_texture(name)
+        rnd = random.Random(seed)
+        last = size - 1
+        for x0, y0, x1, y1 in ((0, 0, last, 0), (0, last, last, last), (0, 0, 0, last), (last, 0, last, last)):
+            engine.rasterize_line(x0, y0, x1, y1, 2)
+        for _ in range(walls):
+            x0, y0 = rnd.randrange(2, last - 1), rnd.randrange(2, last - 1)
+            length = rnd.randrange(2, 24)
+            if rnd.random() < 0.5:
+                x1, y1 = min(last - 1, x0 + length), y0
+            else:
+                x1, y1 = x0, min(last - 1, y0 + length)
+            engine.rasterize_line(x0, y0, x1, y1, rnd.randrange(2, 7))
+        # Keep the flight path (the map diagonal band) clear
+        grid = world.world_map
+        for i in range(4, last - 4):
+            for d in range(-3, 4):
+                grid.set(i + d, i, 0)
+        world.on_map_loaded()
+        engine.add_game_systems(world)
+        engine.start_parallel_render() # engine.render_workers > 0 only
+    return build
+
+def orbit_path(engine, i):
+    """Stand near the middle of the room and turn in place."""
+    t = engine.world.get_component(engine.player_id, Transform)
+    grid = engine.world.world_map
+    t.pos.x = grid.width * 0.5 + 6.0 * math.cos(i * 0.05)
+    t.pos.y = grid.height * 0.5 + 6.0 * math.sin(i * 0.05)
+    t.angle = i * 0.07
+
+def diagonal_path(engine, i):
+    """Fly along the cleared diagonal, looking around."""
+    t = engine.world.get_component(engine.player_id, Transform)
+    grid = engine.world.world_map
+    s = 6.0 + (i * 0.75) % (grid.width - 12.0)
+    t.pos.x = s + 0.5
+    t.pos.y = s + 0.5
+    t.angle = math.pi / 4 + 0.8 * math.sin(i * 0.04)
+
+def key_script(engine, i):
+    """Scripted keyboard input: walk and turn (input + physics path)."""
+    if i == 0:
+        orbit_path(engine, 0)
+    engine.feed_keys("we"[i % 2] if i % 8 else "d")
+
+SCENES = {
+    "test_wad_orbit": (build_test_wad, orbit_path),
+    "test_wad_keys": (build_test_wad, key_script),
+    "synthetic_512": (build_synthetic(512, 1500), diagonal_path),
+    "synthetic_1024": (build_synthetic(1024, 6000), diagonal_path),
+}
+
+# ----------------------------------------------------------------------
+# Running and reporting
+# ----------------------------------------------------------------------
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(math.ceil(p / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+def run_scene(name, mode, frames, warmup, dt, workers=0):
+    build, path = SCENES[name]
+    engine = GameEngine(headless=True, render_workers=workers)
+    engine.raycast_mode = mode
+    engine.world.profiler.enabled = True # Per-stage timings in metrics["system_ms"]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            build(engine)
+            results = engine.run_headless(warmup + frames, dt, path)[warmup:]
+    finally:
+        engine.stop_parallel_render()
+
+    frame_ms = sorted(r["frame_ms"] for r in results)
+    system_ms = {}
+    for r in results:
+        for sys_name, ms in r.get("system_ms", {}).items():
+            system_ms[sys_name] = system_ms.get(sys_name, 0.0) + ms
+    n = max(1, len(results))
+    bytes_out = [r.get("bytes_out", 0) for r in results]
+    return {
+        "frames": len(results),
+        "map": [engine.world.world_map.width, engine.world.world_map.height],
+        "raycast_mode": results[-1].get("raycast_mode", mode) if results else mode,
+        "frame_ms": {
+            "mean": sum(frame_ms) / n,
+            "p50": percentile(frame_ms, 50),
+            "p95": percentile(frame_ms, 95),
+            "p99": percentile(frame_ms, 99),
+            "max": frame_ms[-1] if frame_ms else 0.0,
+        },
+        "system_ms": {k: v / n for k, v in sorted(system_ms.items())},
+        "bytes_out": {"total": sum(bytes_out), "mean": sum(bytes_out) / n},
+        "full_repaints": sum(1 for r in results if r.get("full_repaint")),
+        "dda_iters_per_ray": sum(r.get("dda_iters_per_ray", 0.0) for r in results) / n,
+        "workers": workers,
+        "parallel_frames": sum(1 for r in results if r.get("render_parallel")),
+        "schedule": engine.world.dump_schedule().splitlines(),
+    }
+
+def run_bands(workers, mode="sdf", reps=20, bands=(8, 16, 32, 64, 128, 256)):
+    """
+    Column pass per frame, worker pool vs in-process, for screens of
+    `band` columns per worker (where ParallelRaycaster.min_band should sit).
+    """
+    engine = GameEngine(headless=True, render_workers=workers)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            SCENES["synthetic_512"][0](engine)
+        world = engine.world
+        px, py, pa = world.map_width / 2 + 0.5, world.map_height / 2 + 0.5, 0.7
+        cast = select_caster(world, mode)[0]
+        parallel = engine.parallel_raycaster
+        rows = []
+        for band in bands:
+            width = band * workers
+            table = get_ray_table(width, PI / 2.0)
+            dirs_x, dirs_y = table.rotate(pa)
+            parallel.cast_frame(px, py, pa, width, PI / 2.0, mode) # Warm the workers
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                parallel.cast_frame(px, py, pa, width, PI / 2.0, mode)
+            t1 = time.perf_counter()
+            for _ in range(reps):
+                cast_columns(cast, dirs_x, dirs_y, table.fisheye, px, py, 0, width, array('d'))
+            t2 = time.perf_counter()
+            rows.append({"band": band, "width": width,
+                         "pool_ms": (t1 - t0) * 1000.0 / reps, "local_ms": (t2 - t1) * 1000.0 / reps})
+    finally:
+        engine.stop_parallel_render()
+    return {"workers": workers, "cpus": os.cpu_count(), "min_band": parallel.min_band, "bands": rows}
+
+def build_crowd(n, soa, seed=7, size=256):
+    """
+    World with n moving entities (mixed physics modes) on a cluttered map.
+    Returns (world, bytes allocated per entity).
+    """
+    world = World(soa=soa)
+    world.init_map(size, size, [], [], [])
+    rnd = random.Random(seed)
+    for _ in range(size * size // 8):
+        world.world_map.set(rnd.randrange(size), rnd.randrange(size), rnd.randrange(1, 5))
+    world.query(Transform, Motion) # Query cache exists before spawning
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for k in range(n):
+        e = world.create_entity()
+        world.add_component(e, Transform(Vector3(rnd.uniform(1, size - 1), rnd.uniform(1, size - 1), rnd.uniform(0, 30)),
+                                         rnd.uniform(0, 2 * math.pi)))
+        world.add_component(e, Motion(Vector3(rnd.uniform(-1, 1), rnd.uniform(-1, 1), rnd.uniform(-1, 1)), Vector3()))
+        world.add_component(e, PhysicsMode(k % 3))
+        world.add_component(e, Body(0.4, 1.0))
+        world.add_component(e, Stats(hp=100, armor=0, ammo=0, fuel=0.0))
+    per_entity = (tracemalloc.get_traced_memory()[0] - before) / max(1, n)
+    tracemalloc.stop()
+    return world, per_entity
+
+def run_physics(n, ticks, soa, dt=1.0 / 30.0):
+    """physics_system time per tick with n entities (AoS components or SoA columns)."""
+    world, per_entity = build_crowd(n, soa)
+    tick_ms = []
+    for _ in range(ticks):
+        t0 = time.perf_counter()
+        physics_system(world, None, dt)
+        tick_ms.append((time.perf_counter() - t0) * 1000.0)
+    tick_ms.sort()
+    mean = sum(tick_ms) / len(tick_ms)
+    return {
+        "entities": n,
+        "ticks": ticks,
+        "tick_ms": {"mean": mean, "p50": percentile(tick_ms, 50), "p95": percentile(tick_ms, 95)},
+        "ns_per_entity": mean * 1e6 / max(1, n),
+        "bytes_per_entity": per_entity,
+    }
+
+def run_sleep(n, ticks, soa, sleep, settle=120, dt=1.0 / 30.0):
+    """physics_system time per tick after the crowd settled, with or without sleeping."""
+    world, _ = build_crowd(n, soa)
+    world.sleep_ticks = world.sleep_ticks if sleep else 0
+    for _ in range(settle):
+        physics_system(world, None, dt)
+    tick_ms = []
+    for _ in range(ticks):
+        t0 = time.perf_counter()
+        physics_system(world, None, dt)
+        tick_ms.append((time.perf_counter() - t0) * 1000.0)
+    tick_ms.sort()
+    return {
+        "entities": n,
+        "settle_ticks": settle,
+        "active": world.active_body_count(),
+        "tick_ms": {"mean": sum(tick_ms) / len(tick_ms), "p50": percentile(tick_ms, 50), "p95": percentile(tick_ms, 95)},
+    }
+
+def build_dense_crowd(n, seed=5, density=3.0):
+    """
+    World with n drifting (ZERO_G) bodies packed at `density` per map
+    cell, on three z levels: bodies on levels 0 and 0.5 touch, bodies on
+    level 1.5 only touch each other (exercises the height test).
+    """
+    side = max(4, int(math.ceil(math.sqrt(n / density))))
+    world = World()
+    world.init_map(side + 4, side + 4, [], [], [])
+    world.on_map_loaded()
+    rnd = random.Random(seed)
+    for _ in range(n):
+        e = world.create_entity()
+        world.add_component(e, Transform(Vector3(rnd.uniform(2, side + 2), rnd.uniform(2, side + 2),
+                                                 rnd.choice((0.0, 0.5, 1.5))), 0.0))
+        world.add_component(e, Motion(Vector3(rnd.uniform(-0.05, 0.05), rnd.uniform(-0.05, 0.05), 0.0), Vector3()))
+        world.add_component(e, PhysicsMode(PhysicsModeType.ZERO_G))
+        world.add_component(e, Body(rnd.choice((0.3, 0.4, 0.5)), 1.0))
+    return world
+
+def naive_contacts(world):
+    """
+    O(n^2) reference for SpatialHash.contact_pairs(). Returns (pairs,
+    pairs overlapping in XY that the height test rejected).
+    """
+    bodies = sorted(world.spatial_hash.bodies.items())
+    pairs = []
+    rejected = 0
+    for i, (a, (ax, ay, az, ar, ah)) in enumerate(bodies):
+        for b, (bx, by, bz, br, bh) in bodies[i + 1:]:
+            dx, dy, rr = bx - ax, by - ay, ar + br
+            if dx * dx + dy * dy < rr * rr:
+                if az < bz + bh and bz < az + ah:
+                    pairs.append((a, b))
+                else:
+                    rejected += 1
+    return pairs, rejected
+
+def run_collision(n, ticks, dt=1.0 / 30.0, naive_limit=1000):
+    """Spatial hash on a dense crowd: incremental sync after a physics tick, contacts, queries."""
+    world = build_dense_crowd(n)
+    t0 = time.perf_counter()
+    sync_spatial_hash(world)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    grid = world.spatial_hash
+    rnd = random.Random(3)
+    size = world.world_map.width
+    sync_ms, contact_ms, query_ms = [], [], []
+    for _ in range(ticks):
+        physics_system(world, None, dt)
+        t0 = time.perf_counter()
+        sync_spatial_hash(world)
+        t1 = time.perf_counter()
+        pairs = grid.contact_pairs()
+        t2 = time.perf_counter()
+        for _ in range(100):
+            grid.query_radius(rnd.uniform(0, size), rnd.uniform(0, size), 2.0)
+        t3 = time.perf_counter()
+        sync_ms.append((t1 - t0) * 1000.0)
+        contact_ms.append((t2 - t1) * 1000.0)
+        query_ms.append((t3 - t2) * 10.0) # per query
+    result = {
+        "entities": n,
+        "ticks": ticks,
+        "contacts": len(pairs),
+        "build_ms": build_ms,
+        "sync_ms": sum(sync_ms) / ticks,
+        "contacts_ms": sum(contact_ms) / ticks,
+        "query_radius_ms": sum(query_ms) / ticks,
+    }
+    if n <= naive_limit:
+        t0 = time.perf_counter()
+        reference, result["height_rejected"] = naive_contacts(world)
+        result["naive_ms"] = (time.perf_counter() - t0) * 1000.0
+        assert reference == pairs, "spatial hash contacts differ from the O(n^2) check"
+    return result
+
+def run_raycast(n, rays, seed=11):
+    """World.raycast per ray: walls only, walls + bodies (n bodies), memoized repeats."""
+    world, _ = build_crowd(n, False)
+    world.on_map_loaded()
+    sync_spatial_hash(world)
+    rnd = random.Random(seed)
+    size = world.world_map.width
+    queries = []
+    for _ in range(rays):
+        a = rnd.uniform(0, 2 * math.pi)
+        queries.append((Vector3(rnd.uniform(1, size - 1), rnd.uniform(1, size - 1), 0.0),
+                        Vector3(math.cos(a), math.sin(a), 0.0)))
+    result = {"bodies": n, "rays": rays}
+    for key, mask in (("walls_us", RAY_WALLS), ("all_us", RAY_ALL), ("cached_us", RAY_ALL)):
+        if key != "cached_us":
+            world.ray_cache.clear()
+        t0 = time.perf_counter()
+        hits = world.raycast_many(queries, 64.0, mask)
+        result[key] = (time.perf_counter() - t0) * 1e6 / rays
+    result["body_hits"] = sum(1 for h in hits if h[5])
+    return result
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def print_report(report):
+    print(f"{'scene/mode':32} {'p50':>8} {'p95':>8} {'p99':>8} {'bytes/f':>9}  systems (ms)")
+    for key, r in report["results"].items():
+        fm = r["frame_ms"]
+        systems = " ".join(f"{k.replace('_system', '')}={v:.2f}" for k, v in r["system_ms"].items())
+        print(f"{key:32} {fm['p50']:8.2f} {fm['p95']:8.2f} {fm['p99']:8.2f} {r['bytes_out']['mean']:9.0f}  {systems}")
+
+def print_physics(report, old=None):
+    print(f"\n{'physics':32} {'mean ms':>9} {'p95 ms':>9} {'ns/entity':>10} {'B/entity':>9}")
+    for key, r in report.get("physics", {}).items():
+        line = (f"{key:32} {r['tick_ms']['mean']:9.2f} {r['tick_ms']['p95']:9.2f} {r['ns_per_entity']:10.0f}"
+                f" {r.get('bytes_per_entity', 0):9.0f}")
+        o = (old or {}).get("physics", {}).get(key)
+        if o and o["tick_ms"]["mean"]:
+            line += f"  ({(r['tick_ms']['mean'] - o['tick_ms']['mean']) / o['tick_ms']['mean'] * 100.0:+.0f}%)"
+        print(line)
+
+def print_collision(report):
+    print(f"\n{'collision':16} {'contacts':>9} {'sync ms':>9} {'pairs ms':>9} {'query ms':>9} {'naive ms':>9} {'z-rejected':>10}")
+    for key, r in report.get("collision", {}).items():
+        naive = f"{r['naive_ms']:9.2f}" if "naive_ms" in r else f"{'-':>9}"
+        rejected = f"{r['height_rejected']:10d}" if "height_rejected" in r else f"{'-':>10}"
+        print(f"{key:16} {r['contacts']:9d} {r['sync_ms']:9.2f} {r['contacts_ms']:9.2f} {r['query_radius_ms']:9.4f} {naive} {rejected}")
+
+def print_sleep(report):
+    print(f"\n{'sleep':32} {'active':>9} {'mean ms':>9} {'p95 ms':>9}")
+    for key, r in report.get("sleep", {}).items():
+        print(f"{key:32} {r['active']:9d} {r['tick_ms']['mean']:9.2f} {r['tick_ms']['p95']:9.2f}")
+
+def print_raycast(report):
+    r = report.get("raycast")
+    if not r: return
+    print(f"\nraycast ({r['rays']} rays, {r['bodies']} bodies, 64 units): walls {r['walls_us']:.1f} us"
+          f"  walls+bodies {r['all_us']:.1f} us  memoized {r['cached_us']:.2f} us  ({r['body_hits']} body hits)")
+
+def print_bands(report):
+    r = report.get("bands")
+    if not r: return
+    print(f"\nraycast bands ({r['workers']} workers, {r['cpus']} cpus, min_band {r['min_band']}):")
+    print(f"{'cols/worker':>12} {'width':>7} {'pool ms':>9} {'local ms':>9}")
+    for row in r["bands"]:
+        print(f"{row['band']:12d} {row['width']:7d} {row['pool_ms']:9.2f} {row['local_ms']:9.2f}")
+
+def print_comparison(old, new):
+    """Frame-time and output deltas (new vs old) for the runs both reports share."""
+    print(f"\nvs {old['meta'].get('git') or 'baseline'}:")
+    print(f"{'scene/mode':32} {'p50':>16} {'p95':>16} {'p99':>16} {'bytes/f':>16}")
+    for key, r in new["results"].items():
+        o = old["results"].get(key)
+        if o is None: continue
+        cells = []
+        for a, b in ((o["frame_ms"]["p50"], r["frame_ms"]["p50"]),
+                     (o["frame_ms"]["p95"], r["frame_ms"]["p95"]),
+                     (o["frame_ms"]["p99"], r["frame_ms"]["p99"]),
+                     (o["bytes_out"]["mean"], r["bytes_out"]["mean"])):
+            pct = (b - a) / a * 100.0 if a else 0.0
+            cells.append(f"{b:9.2f} {pct:+5.0f}%")
+        print(f"{key:32} " + " ".join(f"{c:>16}" for c in cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless frame benchmark")
+    parser.add_argument("--scenes", default=",".join(SCENES), help="comma separated: " + ", ".join(SCENES))
+    parser.add_argument("--modes", default="auto", help="raycast modes, comma separated (auto,dda,sdf,mip)")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--dt", type=float, default=1.0 / 30.0)
+    parser.add_argument("--physics", type=int, default=10000, help="physics entity count (0 = skip)")
+    parser.add_argument("--physics-ticks", type=int, default=30)
+    parser.add_argument("--collision", default="100,1000,10000", help="entity counts for the spatial hash ('' = skip)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="also run every scene/mode with N raycast worker processes (0 = skip)")
+    parser.add_argument("--rays", type=int, default=1000, help="World.raycast queries (0 = skip)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="results JSON from an earlier run")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "dt": args.dt,
+            "workers": args.workers,
+        },
+        "results": {},
+    }
+    for name in args.scenes.split(","):
+        if name not in SCENES:
+            parser.error(f"unknown scene {name!r}")
+        for mode in args.modes.split(","):
+            report["results"][f"{name}/{mode}"] = run_scene(name, mode, args.frames, args.warmup, args.dt)
+            if args.workers > 0:
+                report["results"][f"{name}/{mode}/w{args.workers}"] = run_scene(
+                    name, mode, args.frames, args.warmup, args.dt, args.workers)
+    if args.workers > 0:
+        report["bands"] = run_bands(args.workers)
+
+    if args.physics > 0:
+        report["physics"] = {
+            f"{layout}_{args.physics}": run_physics(args.physics, args.physics_ticks, layout == "soa")
+            for layout in ("aos", "soa")
+        }
+        report["sleep"] = {
+            f"{layout}_{args.physics}_{state}": run_sleep(args.physics, args.physics_ticks, layout == "soa", state == "sleep")
+            for layout in ("aos", "soa") for state in ("awake", "sleep")
+        }
+
+    if args.collision:
+        report["collision"] = {
+            f"hash_{n}": run_collision(n, 10) for n in map(int, args.collision.split(","))
+        }
+
+    if args.rays > 0:
+        report["raycast"] = run_raycast(1000, args.rays)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.out}")
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    print_physics(report, old)
+    print_sleep(report)
+    print_collision(report)
+    print_raycast(report)
+    print_bands(report)
+    if old is not None:
+        print_comparison(old, report)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,11 @@
+import sys
 from src.engine import GameEngine
 
 if __name__ == "__main__":
-    game = GameEngine()
-    game.run()
+    # --workers N: raycast column bands in N worker processes (0 = in-process)
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 0
+    game = GameEngine(render_workers=workers)
+    if "--async" in sys.argv:
+        game.run_async() # asyncio loop, stdin read as bytes arrive
+    else:
+        game.run()
@@ -11,6 +11,8 @@ echo " - Q/E: Rotate"
 echo " - R/F: Pitch (Look Up/Down)"
 echo " - Space: Jump / Fly"
 echo " - 1/2/3: Gravity Modes (Normal/Zero-G/Inverted)"
+echo " - V: Cycle Raycast Engine (DDA/SDF/MIP)"
+echo " - P: Profiler Overlay"
 echo "============================================="
 echo "Starting..."
 sleep 1
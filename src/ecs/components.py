@@ -1,25 +1,41 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, fields
 from src.utils.math_core import Vector3
 
-@dataclass
+def _slotted_dataclass(cls):
+    """
+    @dataclass with __slots__ (no per-instance __dict__).
+    dataclass(slots=True) needs Python 3.10; older versions rebuild the
+    class with __slots__ the same way (field defaults live in __init__).
+    """
+    if sys.version_info >= (3, 10):
+        return dataclass(slots=True)(cls)
+    cls = dataclass(cls)
+    names = tuple(f.name for f in fields(cls))
+    body = {k: v for k, v in cls.__dict__.items()
+            if k not in names and k not in ("__dict__", "__weakref__")}
+    body["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, body)
+
+@_slotted_dataclass
 class Transform:
     pos: Vector3
     angle: float  # Horizontal angle (Yaw)
     pitch: float = 0.0  # Vertical tilt (for Z-Shearing)
 
-@dataclass
+@_slotted_dataclass
 class Motion:
     vel: Vector3
     acc: Vector3
     friction: float = 0.9
     bob_timer: float = 0.0
 
-@dataclass
+@_slotted_dataclass
 class Body:
     radius: float
     height: float
 
-@dataclass
+@_slotted_dataclass
 class Stats:
     hp: int
     armor: int
@@ -31,7 +47,7 @@ class PhysicsModeType:
     ZERO_G = 1
     INVERTED = 2
 
-@dataclass
+@_slotted_dataclass
 class PhysicsMode:
     mode: int = PhysicsModeType.NORMAL
 
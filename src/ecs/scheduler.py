@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import perf_counter_ns
+
+class SystemSpec:
+    """
+    A registered system with its declared access. reads/writes hold
+    component types or resource names (e.g. "world_map", "engine").
+    A system that declares neither is exclusive: it conflicts with every
+    other system, like the old plain add_system(func).
+    """
+    def __init__(self, func, reads=(), writes=(), after=()):
+        self.func = func
+        self.name = func.__name__
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+        # Systems (functions or names) that must finish first
+        self.after = tuple(a if isinstance(a, str) else a.__name__ for a in after)
+        self.exclusive = not self.reads and not self.writes
+
+    def conflicts(self, other):
+        if self.exclusive or other.exclusive:
+            return True
+        return bool(self.writes & (other.reads | other.writes) or other.writes & self.reads)
+
+def _label(key):
+    return key.__name__ if isinstance(key, type) else str(key)
+
+class Scheduler:
+    """
+    Runs systems in stages. Two systems get an edge when they conflict
+    (the one registered first runs first) or when one is listed in the
+    other's `after`; each system's stage is the longest path to it, so
+    systems in one stage never conflict and run concurrently on a thread
+    pool. That only pays off for systems that release the GIL (file I/O,
+    hashing, compression...); everything else still runs in order.
+    """
+    def __init__(self, max_workers=None):
+        self.specs = []
+        self.stages = None # [[SystemSpec]], rebuilt after add()
+        self.max_workers = max_workers # None: ThreadPoolExecutor default, 1: no threads
+        self.pool = None
+        self.last_run = [] # (stage, name, start ns, duration ns, thread), when timed
+
+    def add(self, spec):
+        self.specs.append(spec)
+        self.stages = None
+
+    def build(self):
+        specs = self.specs
+        by_name = {}
+        for i, spec in enumerate(specs):
+            by_name.setdefault(spec.name, []).append(i)
+        preds = [set() for _ in specs]
+        for j, spec in enumerate(specs):
+            for i in range(j):
+                if specs[i].conflicts(spec):
+                    preds[j].add(i)
+            for name in spec.after:
+                if name not in by_name:
+                    raise ValueError(f"{spec.name}: runs after unknown system {name!r}")
+                preds[j].update(by_name[name])
+
+        level = [None] * len(specs)
+        visiting = set()
+        def stage_of(j):
+            if level[j] is None:
+                if j in visiting:
+                    raise ValueError(f"system order cycle at {specs[j].name}")
+                visiting.add(j)
+                level[j] = max((stage_of(i) + 1 for i in preds[j]), default=0)
+                visiting.discard(j)
+            return level[j]
+
+        stages = [[] for _ in range(max(map(stage_of, range(len(specs))), default=-1) + 1)]
+        for j, spec in enumerate(specs):
+            stages[level[j]].append(spec)
+        self.stages = stages
+        return stages
+
+    def run(self, world, engine, dt, profiler=None):
+        stages = self.stages if self.stages is not None else self.build()
+        timed = profiler is not None and profiler.enabled
+        if timed:
+            self.last_run = []
+            frame_t0 = perf_counter_ns()
+        for stage_index, stage in enumerate(stages):
+            if len(stage) == 1 or self.max_workers == 1:
+                if not timed:
+                    for spec in stage:
+                        spec.func(world, engine, dt)
+                    continue
+                results = [_timed_call(spec, world, engine, dt) for spec in stage]
+            else:
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="system")
+                call = _timed_call if timed else _call
+                futures = [self.pool.submit(call, spec, world, engine, dt) for spec in stage[1:]]
+                try:
+                    first = call(stage[0], world, engine, dt) # This thread takes a share too
+                finally:
+                    wait(futures)
+                results = [first] + [f.result() for f in futures]
+                if not timed:
+                    continue
+            for spec, start, end, thread in results:
+                profiler.record(spec.name, end - start)
+                self.last_run.append((stage_index, spec.name, start - frame_t0, end - start, thread))
+
+    def dump(self):
+        """Stage plan, plus the last timed run (profiler enabled) if any."""
+        stages = self.stages if self.stages is not None else self.build()
+        lines = [f"schedule: {len(self.specs)} systems in {len(stages)} stages"]
+        for i, stage in enumerate(stages):
+            for spec in stage:
+                if spec.exclusive:
+                    access = "exclusive"
+                else:
+                    access = (f"reads {', '.join(sorted(map(_label, spec.reads))) or '-'}"
+                              f" | writes {', '.join(sorted(map(_label, spec.writes))) or '-'}")
+                after = f" | after {', '.join(spec.after)}" if spec.after else ""
+                lines.append(f"  stage {i}: {spec.name:24} {access}{after}")
+        if self.last_run:
+            lines.append("last timed run:")
+            for stage_index, name, start, duration, thread in self.last_run:
+                lines.append(f"  stage {stage_index}: {name:24} +{start / 1e6:7.3f} ms {duration / 1e6:7.3f} ms  {thread}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+def _call(spec, world, engine, dt):
+    spec.func(world, engine, dt)
+
+def _timed_call(spec, world, engine, dt):
+    start = perf_counter_ns()
+    spec.func(world, engine, dt)
+    return spec, start, perf_counter_ns(), threading.current_thread().name
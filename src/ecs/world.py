@@ -1,20 +1,334 @@
-class World:
+import threading
+from array import array
+from src.ecs.components import Transform, Motion, Body
+from src.ecs.scheduler import SystemSpec, Scheduler
+from src.utils.math_core import Vector3
+from src.utils.grid_map import GridMap
+from src.utils.distance_field import DistanceField
+from src.utils.occupancy_mip import OccupancyMip
+from src.utils.collision_grid import CollisionGrid
+from src.utils.ascii_texture_gen import make_texture_record
+from src.utils.profiler import Profiler
+from src.utils.spatial_hash import SpatialHash
+from src.utils.raycast import select_caster, cast_segment, MAX_DEPTH, RAY_WALLS, RAY_BODIES, RAY_ALL
+
+# ----------------------------------------------------------------------
+# Generational entity ids: index | generation << ENTITY_INDEX_BITS
+# ----------------------------------------------------------------------
+ENTITY_INDEX_BITS = 20
+ENTITY_INDEX_MASK = (1 << ENTITY_INDEX_BITS) - 1
+
+def entity_index(entity_id):
+    return entity_id & ENTITY_INDEX_MASK
+
+def entity_generation(entity_id):
+    return entity_id >> ENTITY_INDEX_BITS
+
+class Query:
+    """Cached member set of one component-type combination."""
+    def __init__(self, types):
+        self.types = types
+        self.ids = {} # entity id -> None (ordered set)
+        self._members = () # Sorted snapshot, None = stale
+
+    def add(self, entity_id):
+        if entity_id not in self.ids:
+            self.ids[entity_id] = None
+            self._members = None
+
+    def discard(self, entity_id):
+        if entity_id in self.ids:
+            del self.ids[entity_id]
+            self._members = None
+
+    def members(self):
+        if self._members is None:
+            self._members = tuple(sorted(self.ids))
+        return self._members
+
+# ----------------------------------------------------------------------
+# Struct-of-arrays backend for Transform / Motion (World(soa=True))
+# ----------------------------------------------------------------------
+HAS_TRANSFORM = 1
+HAS_MOTION = 2
+
+class SlotHandle:
+    """An entity's current slot; updated when slots are compacted."""
+    __slots__ = ("i",)
+    def __init__(self, i):
+        self.i = i
+
+def _column_property(name):
+    def get(self):
+        return getattr(self, name)[self._h.i]
+    def set(self, value):
+        getattr(self, name)[self._h.i] = value
+    return property(get, set)
+
+class Vec3View(Vector3):
+    """Vector3 whose x/y/z live in three SoA columns."""
+    __slots__ = ("_x", "_y", "_z", "_h")
+    def __init__(self, col_x, col_y, col_z, handle):
+        self._x, self._y, self._z, self._h = col_x, col_y, col_z, handle
+    x = _column_property("_x")
+    y = _column_property("_y")
+    z = _column_property("_z")
+
+    def __repr__(self):
+        return f"Vec3View({self.x}, {self.y}, {self.z})"
+
+class TransformView:
+    """Transform-compatible view of one SoA slot."""
+    __slots__ = ("_store", "_h", "_pos")
+    def __init__(self, store, handle):
+        self._store, self._h = store, handle
+        self._pos = Vec3View(store.pos_x, store.pos_y, store.pos_z, handle)
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, v):
+        self._pos.x, self._pos.y, self._pos.z = v.x, v.y, v.z
+
+    angle = property(lambda self: self._store.angle[self._h.i],
+                     lambda self, v: self._store.angle.__setitem__(self._h.i, v))
+    pitch = property(lambda self: self._store.pitch[self._h.i],
+                     lambda self, v: self._store.pitch.__setitem__(self._h.i, v))
+
+    def __repr__(self):
+        return f"TransformView(pos={self.pos!r}, angle={self.angle}, pitch={self.pitch})"
+
+class MotionView:
+    """Motion-compatible view of one SoA slot."""
+    __slots__ = ("_store", "_h", "_vel", "_acc")
+    def __init__(self, store, handle):
+        self._store, self._h = store, handle
+        self._vel = Vec3View(store.vel_x, store.vel_y, store.vel_z, handle)
+        self._acc = Vec3View(store.acc_x, store.acc_y, store.acc_z, handle)
+
+    @property
+    def vel(self):
+        return self._vel
+
+    @vel.setter
+    def vel(self, v):
+        self._vel.x, self._vel.y, self._vel.z = v.x, v.y, v.z
+
+    @property
+    def acc(self):
+        return self._acc
+
+    @acc.setter
+    def acc(self, v):
+        self._acc.x, self._acc.y, self._acc.z = v.x, v.y, v.z
+
+    friction = property(lambda self: self._store.friction[self._h.i],
+                        lambda self, v: self._store.friction.__setitem__(self._h.i, v))
+    bob_timer = property(lambda self: self._store.bob_timer[self._h.i],
+                         lambda self, v: self._store.bob_timer.__setitem__(self._h.i, v))
+
+    def __repr__(self):
+        return f"MotionView(vel={self.vel!r}, friction={self.friction})"
+
+class SoAStore:
+    """
+    Transform and Motion data as parallel array('d') columns, indexed by
+    a dense per-entity slot (slots 0..count-1 are all live). Removing an
+    entity moves the last slot into the hole and updates its handle, so
+    views stay valid. Batched systems loop over the columns directly;
+    everything else uses the views.
+    """
+    FIELDS = ("pos_x", "pos_y", "pos_z", "angle", "pitch",
+              "vel_x", "vel_y", "vel_z", "acc_x", "acc_y", "acc_z",
+              "friction", "bob_timer")
+
     def __init__(self):
-        self.next_entity_id = 0
-        self.entities = {} # id -> set(Component Types)
+        for name in self.FIELDS:
+            setattr(self, name, array('d'))
+        self.flags = bytearray() # slot -> HAS_TRANSFORM | HAS_MOTION
+        self.entity = [] # slot -> entity id
+        self.handles = {} # entity id -> SlotHandle
+
+    @property
+    def count(self):
+        return len(self.entity)
+
+    def handle(self, entity_id):
+        """Slot handle of an entity, allocating a zeroed slot if needed."""
+        h = self.handles.get(entity_id)
+        if h is None:
+            h = SlotHandle(len(self.entity))
+            for name in self.FIELDS:
+                getattr(self, name).append(0.0)
+            self.flags.append(0)
+            self.entity.append(entity_id)
+            self.handles[entity_id] = h
+        return h
+
+    def set_transform(self, entity_id, t):
+        h = self.handle(entity_id)
+        i = h.i
+        self.pos_x[i], self.pos_y[i], self.pos_z[i] = t.pos.x, t.pos.y, t.pos.z
+        self.angle[i], self.pitch[i] = t.angle, t.pitch
+        self.flags[i] |= HAS_TRANSFORM
+        return TransformView(self, h)
+
+    def set_motion(self, entity_id, m):
+        h = self.handle(entity_id)
+        i = h.i
+        self.vel_x[i], self.vel_y[i], self.vel_z[i] = m.vel.x, m.vel.y, m.vel.z
+        self.acc_x[i], self.acc_y[i], self.acc_z[i] = m.acc.x, m.acc.y, m.acc.z
+        self.friction[i], self.bob_timer[i] = m.friction, m.bob_timer
+        self.flags[i] |= HAS_MOTION
+        return MotionView(self, h)
+
+    def clear_flag(self, entity_id, flag):
+        h = self.handles.get(entity_id)
+        if h is None: return
+        self.flags[h.i] &= ~flag & 0xFF
+        if not self.flags[h.i]:
+            self.release(entity_id)
+
+    def release(self, entity_id):
+        """Free an entity's slot (the last slot moves into it)."""
+        h = self.handles.pop(entity_id, None)
+        if h is None: return
+        i = h.i
+        last = len(self.entity) - 1
+        if i != last:
+            for name in self.FIELDS:
+                col = getattr(self, name)
+                col[i] = col[last]
+            self.flags[i] = self.flags[last]
+            moved = self.entity[last]
+            self.entity[i] = moved
+            self.handles[moved].i = i
+        for name in self.FIELDS:
+            getattr(self, name).pop()
+        self.flags.pop()
+        self.entity.pop()
+        h.i = -1
+
+class World:
+    """
+    Entity ids are generational handles: freed indices are recycled from
+    a free list with their generation bumped, so an id kept after its
+    entity was removed never refers to the entity that reuses the slot
+    (is_alive() is False, remove_entity() is a no-op).
+    """
+    def __init__(self, soa=False):
+        self.generations = [] # index -> current generation
+        self.free_indices = [] # Recycled indices (LIFO)
+        self.pending_destroy = {} # id -> None, removed at the end of update()
+        self.entities = {} # id -> {Component Type -> Component}
         self.components = {} # Type -> {id -> Component}
-        self.systems = []
-        self.texture_registry = ["EMPTY", "DEFAULT_WALL"] # 0=Empty, 1=Default
+        self.queries = {} # (Type, ...) -> Query, kept current by add/remove
+        self.queries_by_type = {} # Type -> [Query] that include it
+        self.singletons = {} # name -> entity id (e.g. "player")
+        # Entity broadphase (Transform + Body), refreshed by collision_system
+        self.spatial_hash = SpatialHash()
+        self.spatial_members = () # query(Transform, Body) at the last sync
+        self.contacts = [] # (a, b) overlapping bodies, last tick
+        # raycast() results, cleared every tick and when walls or bodies move
+        self.ray_cache = {}
+        # Resting bodies are not simulated until woken (see physics_system)
+        self.sleep_ticks = 30 # Still ticks before a body sleeps (0 = never)
+        self.sleeping = {} # entity id -> None
+        self.rest_ticks = {} # entity id -> consecutive still ticks (awake bodies)
+        # Optional struct-of-arrays storage for Transform/Motion; get_component
+        # then returns views over the columns
+        self.soa = SoAStore() if soa else None
+        self.scheduler = Scheduler() # Systems, ordered by declared access
+        self._query_lock = threading.Lock() # Query creation (systems may run in threads)
+        self.profiler = Profiler() # Per-system timings (off until enabled)
+        # Texture id -> TextureRecord (0=Empty, 1=Default). Plain name
+        # strings are also accepted and resolved by the renderer.
+        self.texture_registry = [make_texture_record("EMPTY"), make_texture_record("DEFAULT_WALL")]
+        self.texture_ids = {"EMPTY": 0, "DEFAULT_WALL": 1} # name -> id
+        self.map_listeners = [] # f(x, y) called after set_cell()
+        self.collision_grids = {} # Body radius -> CollisionGrid
 
     def create_entity(self):
-        entity_id = self.next_entity_id
+        if self.free_indices:
+            index = self.free_indices.pop()
+        else:
+            index = len(self.generations)
+            if index > ENTITY_INDEX_MASK:
+                raise OverflowError("too many live entities")
+            self.generations.append(0)
+        entity_id = index | self.generations[index] << ENTITY_INDEX_BITS
         self.entities[entity_id] = {}
-        self.next_entity_id += 1
         return entity_id
 
-    def add_component(self, entity_id, component):
+    def is_alive(self, entity_id):
+        return entity_id in self.entities
+
+    def _store_component(self, entity_id, component):
+        """Attach without touching queries. Returns (type, components, is_new)."""
         comp_type = type(component)
-        self.entities[entity_id][comp_type] = component
+        if self.soa is not None:
+            if comp_type is Transform:
+                component = self.soa.set_transform(entity_id, component)
+            elif comp_type is Motion:
+                component = self.soa.set_motion(entity_id, component)
+        components = self.entities[entity_id]
+        is_new = comp_type not in components
+        components[comp_type] = component
+        self.components.setdefault(comp_type, {})[entity_id] = component
+        return comp_type, components, is_new
+
+    def add_component(self, entity_id, component):
+        comp_type, components, is_new = self._store_component(entity_id, component)
+        if is_new:
+            for query in self.queries_by_type.get(comp_type, ()):
+                if all(ct in components for ct in query.types):
+                    query.add(entity_id)
+
+    def spawn_batch(self, n, components):
+        """
+        Create n entities at once. components holds one source per
+        component type: either a sequence of n components or a callable
+        k -> component for the k-th entity. Cached queries are updated
+        once per query instead of once per added component.
+        Returns the new ids.
+        """
+        # Materialise every source first: a bad one fails before any entity exists
+        columns = []
+        for source in components:
+            comps = [source(k) for k in range(n)] if callable(source) else list(source)
+            if len(comps) != n:
+                raise ValueError(f"expected {n} components, got {len(comps)}")
+            columns.append(comps)
+        ids = [self.create_entity() for _ in range(n)]
+        types = set()
+        for comps in columns:
+            for entity_id, component in zip(ids, comps):
+                types.add(self._store_component(entity_id, component)[0])
+        queries = {id(q): q for ct in types for q in self.queries_by_type.get(ct, ())}
+        for query in queries.values():
+            for entity_id in ids:
+                components = self.entities[entity_id]
+                if all(ct in components for ct in query.types):
+                    query.add(entity_id)
+        return ids
+
+    def remove_component(self, entity_id, component_type):
+        components = self.entities[entity_id]
+        if component_type not in components:
+            return
+        for query in self.queries_by_type.get(component_type, ()):
+            query.discard(entity_id)
+        if component_type is Transform or component_type is Motion:
+            self.wake(entity_id)
+        del components[component_type]
+        del self.components[component_type][entity_id]
+        if self.soa is not None:
+            if component_type is Transform:
+                self.soa.clear_flag(entity_id, HAS_TRANSFORM)
+            elif component_type is Motion:
+                self.soa.clear_flag(entity_id, HAS_MOTION)
 
     def get_component(self, entity_id, component_type):
         return self.entities[entity_id].get(component_type)
@@ -23,31 +337,243 @@ class World:
         return component_type in self.entities[entity_id]
 
     def remove_entity(self, entity_id):
+        """Remove now (stale or unknown ids are ignored)."""
+        self.despawn_batch((entity_id,))
+
+    def despawn_batch(self, entity_ids):
+        """
+        Remove entities now, freeing their components and recycling their
+        indices. Use destroy_entity() from inside systems instead.
+        """
+        entities = self.entities
+        dead = [e for e in dict.fromkeys(entity_ids) if e in entities]
+        if not dead:
+            return
+        for entity_id in dead:
+            for comp_type in entities[entity_id]:
+                for query in self.queries_by_type.get(comp_type, ()):
+                    query.discard(entity_id)
+                del self.components[comp_type][entity_id]
+            del entities[entity_id]
+            if self.soa is not None:
+                self.soa.release(entity_id)
+            self.pending_destroy.pop(entity_id, None)
+            self.sleeping.pop(entity_id, None)
+            self.rest_ticks.pop(entity_id, None)
+            index = entity_id & ENTITY_INDEX_MASK
+            self.generations[index] += 1
+            self.free_indices.append(index)
+        dead_set = set(dead)
+        for name, singleton_id in list(self.singletons.items()):
+            if singleton_id in dead_set:
+                del self.singletons[name]
+
+    def destroy_entity(self, entity_id):
+        """
+        Deferred removal: the entity stays alive (components, queries)
+        until the end of the current update(), so systems can keep
+        iterating while they destroy entities.
+        """
         if entity_id in self.entities:
-            del self.entities[entity_id]
+            self.pending_destroy[entity_id] = None
+
+    def flush_destroyed(self):
+        """Apply destroy_entity() calls made since the last flush."""
+        if self.pending_destroy:
+            pending = list(self.pending_destroy)
+            self.pending_destroy.clear()
+            self.despawn_batch(pending)
+
+    def sleep(self, entity_id):
+        """Stop simulating a body (its velocity is zeroed)."""
+        motion = self.get_component(entity_id, Motion)
+        if motion is not None:
+            motion.vel.set(0.0, 0.0, 0.0)
+        self.sleeping[entity_id] = None
+        self.rest_ticks.pop(entity_id, None)
+
+    def wake(self, entity_id):
+        """
+        Simulate a sleeping body again. Call after changing its velocity or
+        physics mode from outside physics_system (impulses, input).
+        """
+        if entity_id in self.sleeping:
+            del self.sleeping[entity_id]
+        self.rest_ticks.pop(entity_id, None)
+
+    def wake_near(self, x, y, margin=2.0):
+        """Wake sleeping bodies within margin cells of point (x, y)."""
+        transforms = self.components.get(Transform, {})
+        for entity_id in list(self.sleeping):
+            pos = transforms[entity_id].pos
+            if abs(pos.x - x) <= margin and abs(pos.y - y) <= margin:
+                self.wake(entity_id)
 
-    def add_system(self, system_func):
-        self.systems.append(system_func)
+    def active_body_count(self):
+        """Transform + Motion entities that are simulated (not sleeping)."""
+        return len(self.query(Transform, Motion)) - len(self.sleeping)
+
+    def add_system(self, system_func, reads=(), writes=(), after=()):
+        """
+        Register system_func(world, engine, dt). reads/writes declare the
+        component types and resources it touches (systems that declare
+        nothing run alone); after names systems that must run first.
+        Systems without conflicts run concurrently (see Scheduler).
+        """
+        self.scheduler.add(SystemSpec(system_func, reads, writes, after))
+
+    @property
+    def systems(self):
+        return [spec.func for spec in self.scheduler.specs]
+
+    def dump_schedule(self):
+        return self.scheduler.dump()
+
+    def close(self):
+        self.scheduler.close()
 
     def update(self, dt, engine):
-        for system in self.systems:
-            system(self, engine, dt)
+        self.ray_cache.clear()
+        self.scheduler.run(self, engine, dt, self.profiler)
+        # Deferred destruction at the end of the tick
+        if self.pending_destroy:
+            self.flush_destroyed()
 
     def get_entities_with(self, *component_types):
-        """Yield entities that have all specified components."""
-        for entity_id, components in self.entities.items():
-            if all(ct in components for ct in component_types):
-                yield entity_id
+        """Iterate entities that have all specified components (id order)."""
+        return iter(self.query(*component_types))
+
+    def query(self, *component_types):
+        """
+        Tuple of the entities that have all specified components, in id
+        order. The cached query is built on first use and then kept up to
+        date by add_component/remove_component/remove_entity; the tuple is
+        only rebuilt after its membership changed, and stays valid to
+        iterate while entities are added or removed.
+        """
+        query = self.queries.get(component_types)
+        if query is None:
+            with self._query_lock:
+                query = self.queries.get(component_types)
+                if query is None:
+                    query = Query(component_types)
+                    for entity_id, components in self.entities.items():
+                        if all(ct in components for ct in component_types):
+                            query.add(entity_id)
+                    self.queries[component_types] = query
+                    for comp_type in set(component_types):
+                        self.queries_by_type.setdefault(comp_type, []).append(query)
+        return query.members()
+
+    def set_singleton(self, name, entity_id):
+        """Register entity_id under a name (cleared when it is removed)."""
+        self.singletons[name] = entity_id
+
+    def singleton(self, name, *component_types):
+        """
+        Entity registered under name; if there is none, the first entity
+        with all component_types (None if that is empty too).
+        """
+        entity_id = self.singletons.get(name)
+        if entity_id is None and component_types:
+            members = self.query(*component_types)
+            return members[0] if members else None
+        return entity_id
 
     def init_map(self, width, height, vertexes, linedefs, sidedefs):
         self.map_width = width
         self.map_height = height
-        self.world_map = [[0 for _ in range(height)] for _ in range(width)]
+        self.world_map = GridMap(width, height)
+        self.distance_field = None # Built by on_map_loaded()
+        self.occupancy_mip = None
+        self.collision_grids = {}
         self.vertexes = vertexes
         self.linedefs = linedefs
         self.sidedefs = sidedefs
         self.map_bounds = None
         self.linedefs = linedefs if linedefs else []
+        self.ray_cache.clear()
+
+    def on_map_loaded(self):
+        """Build derived map data once the level is rasterized."""
+        self.distance_field = DistanceField(self.world_map)
+        self.occupancy_mip = OccupancyMip(self.world_map)
+        # Wall runs per body radius (others are built on first use)
+        self.collision_grids = {}
+        for radius in {body.radius for body in self.components.get(Body, {}).values()}:
+            self.collision_grid(radius)
+
+    def collision_grid(self, radius):
+        """CollisionGrid for a body radius (built on first use after load)."""
+        grid = self.collision_grids.get(radius)
+        if grid is None:
+            grid = self.collision_grids[radius] = CollisionGrid(self.world_map, radius)
+        return grid
+
+    def set_cell(self, x, y, value):
+        """Change a map cell after load, keeping derived map data in sync."""
+        self.world_map.set(x, y, value)
+        if self.distance_field is not None:
+            self.distance_field.update_cell(x, y)
+        if self.occupancy_mip is not None:
+            self.occupancy_mip.update_cell(x, y)
+        for collision_grid in self.collision_grids.values():
+            collision_grid.update_cell(x, y)
+        if self.sleeping:
+            self.wake_near(x + 0.5, y + 0.5) # Bodies resting against the cell
+        self.ray_cache.clear()
+        for listener in self.map_listeners:
+            listener(x, y)
+
+    def raycast(self, origin, direction, max_dist=MAX_DEPTH, mask=RAY_ALL, ignore=None):
+        """
+        Walk a ray from origin (Vector3, z ignored) along direction (need
+        not be normalized) for up to max_dist map units. Returns
+        (dist, tex_id, map_x, map_y, side, bodies):
+        - dist, tex_id, map_x, map_y, side: first wall hit, as in the
+          renderer (tex_id 0 and dist = max_dist when there is none, or
+          when mask leaves out RAY_WALLS)
+        - bodies: (distance, entity id) of the bodies in the spatial hash
+          the ray enters before the wall, nearest first (RAY_BODIES only);
+          `ignore` (e.g. the shooter) is left out
+        Identical queries within a tick return the cached result.
+        """
+        return self._raycast(select_caster(self, "auto")[0] if mask & RAY_WALLS else None,
+                             origin.x, origin.y, direction.x, direction.y, max_dist, mask, ignore)
+
+    def raycast_many(self, rays, max_dist=MAX_DEPTH, mask=RAY_ALL, ignore=None):
+        """raycast() for each (origin, direction) in rays (e.g. shotgun pellets)."""
+        cast = select_caster(self, "auto")[0] if mask & RAY_WALLS else None
+        return [self._raycast(cast, o.x, o.y, d.x, d.y, max_dist, mask, ignore) for o, d in rays]
+
+    def _raycast(self, cast, px, py, dir_x, dir_y, max_dist, mask, ignore):
+        length = (dir_x * dir_x + dir_y * dir_y) ** 0.5
+        if length == 0:
+            raise ValueError("raycast direction is zero")
+        dir_x, dir_y = dir_x / length, dir_y / length
+        key = (px, py, dir_x, dir_y, max_dist, mask)
+        hit = self.ray_cache.get(key)
+        if hit is None:
+            if cast is not None and getattr(self, 'world_map', None) is not None:
+                hit = cast_segment(cast, px, py, dir_x, dir_y, max_dist)
+            else:
+                hit = (max_dist, 0, int(px), int(py), 0)
+            bodies = ()
+            if mask & RAY_BODIES:
+                bodies = tuple(self.spatial_hash.query_ray(px, py, dir_x, dir_y, hit[0]))
+            hit = self.ray_cache[key] = hit + (bodies,)
+        if ignore is not None and any(e == ignore for _, e in hit[5]):
+            hit = hit[:5] + (tuple(b for b in hit[5] if b[1] != ignore),)
+        return hit
+
+    def register_texture(self, name):
+        """Texture id for name, resolving and registering it on first use."""
+        tex_id = self.texture_ids.get(name)
+        if tex_id is None:
+            tex_id = len(self.texture_registry)
+            self.texture_registry.append(make_texture_record(name))
+            self.texture_ids[name] = tex_id
+        return tex_id
 
     def create_wall(self, x1, y1, x2, y2, texture_id=1):
         from src.ecs.components import Wall
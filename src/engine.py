@@ -1,23 +1,36 @@
+import io
+import os
 import sys
+import asyncio
 import time
+import select
 import termios
 import tty
+from collections import deque
 from src.ecs.world import World
-from src.ecs.components import Transform, Motion, PhysicsMode, Render, Wall, Stats
+from src.ecs.components import Transform, Motion, PhysicsMode, Render, Wall, Stats, Body
 from src.utils.math_core import Vector3, PI
 from src.systems.input_sys import input_system
 from src.systems.physics_sys import physics_system
-from src.systems.render_sys import render_system
+from src.systems.collision_sys import collision_system
+from src.systems.render_sys import render_system, render_automap
 from src.systems.ui_sys import ui_system
 from src.utils.wad_loader import WADLoader
+from src.utils.terminal_writer import TerminalWriter, ThreadedTerminalWriter
+from src.utils.frame_buffer import FrameBuffer
+from src.utils.strip_cache import StripCache
+from src.utils.key_parser import KeyParser
 
 class GameEngine:
-    def __init__(self):
-        self.world = World()
+    def __init__(self, headless=False, soa=False, render_workers=0):
+        self.world = World(soa=soa) # soa: Transform/Motion in array columns
+        self.headless = headless # No terminal: scripted input, output kept in memory
+        self.wad_path = "assets/Doom1.WAD"
+        self.level_name = "E1M1"
         self.running = False
         self.width = 200
         self.height = 40
-        self.frame_buffer = [[" " for _ in range(self.width)] for _ in range(self.height)]
+        self.frame_buffer = FrameBuffer(self.width, self.height)
         
         # Terminal state
         self.original_termios = None
@@ -26,6 +39,31 @@ class GameEngine:
         self.player_id = None
         self.show_automap = False # Toggle via TAB
         self.input_cooldown = 0.0 # Debounce timer
+        self.raycast_mode = "auto" # auto / dda / sdf / mip (cycle with V)
+        self.render_workers = render_workers # >0: raycast column bands in a process pool
+        self.parallel_raycaster = None
+        self.strip_cache = StripCache() # Composed wall column strips (LRU)
+        self.show_profiler = False # Stats overlay in the HUD (toggle via P)
+
+        # Timing: simulation ticks at a fixed rate, rendering at its own
+        self.tick_rate = 30.0 # Simulation ticks per second (gameplay was tuned at ~30)
+        self.render_rate = 30.0 # Frames per second (cap)
+        self.max_ticks_per_frame = 5 # Catch-up limit after a stall
+        self.prev_transforms = {} # entity -> pose before the last tick
+
+        # Output: delta-encoded writer (full repaint above this changed fraction)
+        self.full_repaint_ratio = 0.5
+        self.output = io.BytesIO() if headless else None # Last frame's bytes (headless)
+        self.output_thread = True # Terminal runs: write frames from a background thread
+        self.writer = TerminalWriter(self.width, self.height, self.full_repaint_ratio, stream=self.output)
+        self.metrics = {} # Per-frame stats (bytes_out, ...)
+
+        # Input
+        self.key_events = deque() # (key, arrival perf_counter) from stdin or feed_keys()
+        self.key_parser = KeyParser(self.key_events)
+        self.stdin_reader = False # True while an asyncio reader owns stdin
+        self.input_arrival = None # Earliest key consumed since the last frame
+        self.log_lines = [] # log() output in headless mode
 
     def setup_terminal(self):
         """Set terminal to raw mode for non-blocking input."""
@@ -43,26 +81,59 @@ class GameEngine:
         sys.stdout.write("\033[?25h")
         sys.stdout.flush()
 
+    def feed_keys(self, keys):
+        """Queue input as if typed (str or bytes, e.g. "www" or "\x1b[C")."""
+        self.key_parser.feed(keys, time.perf_counter())
+
+    def read_stdin(self):
+        """Parse whatever is waiting on stdin into key events."""
+        data = os.read(sys.stdin.fileno(), 1024)
+        if not data:
+            self.running = False # stdin closed
+            return
+        self.key_parser.feed(data, time.perf_counter())
+
+    def read_key(self):
+        """
+        Next key (one character, or a whole escape sequence such as
+        "\x1b[A"), or None. Never blocks.
+        """
+        if not self.key_events:
+            if not (self.headless or self.stdin_reader):
+                if select.select([sys.stdin], [], [], 0)[0]:
+                    self.read_stdin()
+            if self.key_parser.pending:
+                self.key_parser.flush_stale(time.perf_counter())
+            if not self.key_events:
+                return None
+        key, arrived = self.key_events.popleft()
+        if self.input_arrival is None:
+            self.input_arrival = arrived
+        return key
+
     def clear_buffer(self):
-        for y in range(self.height):
-            for x in range(self.width):
-                self.frame_buffer[y][x] = " "
-
-    def render_to_terminal(self):
-        """Optimized rendering using string join."""
-        # Move cursor to top-left
-        sys.stdout.write("\033[H")
-        
-        lines = []
-        for row in self.frame_buffer:
-            lines.append("".join(row))
-        
-        full_frame = "\r\n".join(lines)
-        sys.stdout.write(full_frame)
-        sys.stdout.flush()
+        self.frame_buffer.clear()
+
+    def render_to_terminal(self, input_arrival=None):
+        """
+        Send only the cells that changed since the last frame.
+        input_arrival: time of the earliest input the frame shows (the
+        writer measures input latency against it once the frame is out).
+        """
+        self.writer.full_repaint_ratio = self.full_repaint_ratio
+        if self.output is not None:
+            self.output.seek(0)
+            self.output.truncate()
+        self.metrics["bytes_out"] = self.writer.write(self.frame_buffer, input_arrival)
+        self.metrics["full_repaint"] = self.writer.last_frame_full
+        self.metrics["dropped_frames"] = self.writer.dropped
+        self.metrics["write_latency_ms"] = self.writer.last_write_latency * 1000.0
 
     def log(self, msg):
         """Helper to print correctly in raw mode."""
+        if self.headless:
+            self.log_lines.append(msg)
+            return
         sys.stdout.write(msg + "\r\n")
         sys.stdout.flush()
 
@@ -79,10 +150,10 @@ class GameEngine:
         for y in range(self.world.map_height - 1, -1, -1):
             line = []
             for x in range(self.world.map_width):
+                val = self.world.world_map.get(x, y)
                 if x == px and y == py:
                     line.append("P")
-                elif self.world.world_map[x][y] > 0:
-                    val = self.world.world_map[x][y]
+                elif val > 0:
                     # 텍스처 ID에 따른 문자 구분
                     char = "#" if val == 1 else ("%" if val == 2 else "+")
                     line.append(char)
@@ -104,10 +175,9 @@ class GameEngine:
         sy = 1 if y0 < y1 else -1
         err = dx - dy
 
+        grid = self.world.world_map
         while True:
-            gx, gy = int(x0), int(y0)
-            if 0 <= gx < self.world.map_width and 0 <= gy < self.world.map_height:
-                self.world.world_map[gx][gy] = texture_id
+            grid.set(int(x0), int(y0), texture_id)
             
             if x0 == x1 and y0 == y1:
                 break
@@ -124,7 +194,7 @@ class GameEngine:
         """WAD 데이터를 읽어 그리드 맵으로 래스터화"""
         try:
             self.log(f"[*] Loading {map_name}...")
-            self.loader = WADLoader("assets/Doom1.WAD")
+            self.loader = WADLoader(self.wad_path)
             verts, lines, things, sides = self.loader.load_map_data(map_name)
 
             # 1. Scaling (Doom 100 -> Engine 20)
@@ -161,13 +231,14 @@ class GameEngine:
                 right_side_idx = line[3]
                 if right_side_idx != -1 and right_side_idx < len(sides):
                     tex_name = sides[right_side_idx]['mid']
-                    # Register texture if new
-                    if tex_name not in self.world.texture_registry:
-                        self.world.texture_registry.append(tex_name)
-                    tex_idx = self.world.texture_registry.index(tex_name)
+                    # Register texture if new (pattern resolved once here)
+                    tex_idx = self.world.register_texture(tex_name)
 
                 self.rasterize_line(int(x1), int(y1), int(x2), int(y2), tex_idx)
 
+            # Distance field etc. for the raycaster
+            self.world.on_map_loaded()
+
             # 3. Player Spawn
             player_start = next((t for t in things if t['type'] == 1), None)
             if player_start and self.player_id is not None:
@@ -179,7 +250,8 @@ class GameEngine:
                 
                 # Safe Spawn Logic (Spiral Search)
                 # If spawn point is inside a wall (val > 0), search outward
-                if self.world.world_map[int(px)][int(py)] > 0:
+                grid = self.world.world_map
+                if grid.get(int(px), int(py)) > 0:
                     self.log(f"[!] Spawn ({int(px)},{int(py)}) is SOLID! Searching nearby...")
                     found = False
                     radius = 1
@@ -187,8 +259,8 @@ class GameEngine:
                         for dx in range(-radius, radius + 1):
                             for dy in range(-radius, radius + 1):
                                 nx, ny = int(px) + dx, int(py) + dy
-                                if 0 <= nx < self.world.map_width and 0 <= ny < self.world.map_height:
-                                    if self.world.world_map[nx][ny] == 0:
+                                if grid.in_bounds(nx, ny):
+                                    if grid.get(nx, ny) == 0:
                                         p_trans.pos.x = float(nx) + 0.5 # Center in cell
                                         p_trans.pos.y = float(ny) + 0.5
                                         px, py = p_trans.pos.x, p_trans.pos.y
@@ -217,22 +289,63 @@ class GameEngine:
     def init_game(self):
         """Initialize world, systems, and load level."""
         # Create Player first to ensure consistent ID (usually 0)
+        self.spawn_player()
+        
+        # Load the level map
+        self.loader = WADLoader(self.wad_path)
+        self.load_wad_assets()
+        self.load_level(self.level_name)
+        self.start_parallel_render()
+        
+        # Add systems (declared access decides what may run concurrently)
+        self.add_game_systems(self.world)
+
+    @staticmethod
+    def add_game_systems(world):
+        world.add_system(input_system, writes=(Transform, Motion, PhysicsMode, "engine", "sleep"))
+        world.add_system(physics_system, reads=(PhysicsMode, Body, "world_map"),
+                         writes=(Transform, Motion, "collision_grids", "sleep"), after=(input_system,))
+        world.add_system(collision_system, reads=(Transform, Motion, Body),
+                         writes=("spatial_hash", "contacts", "sleep", "ray_cache"), after=(physics_system,))
+
+    def spawn_player(self):
         self.player_id = self.world.create_entity()
         self.world.add_component(self.player_id, Transform(Vector3(0, 0, 41), 0.0))
         self.world.add_component(self.player_id, Motion(Vector3(), Vector3()))
         self.world.add_component(self.player_id, PhysicsMode())
         self.world.add_component(self.player_id, Render("@"))
+        self.world.add_component(self.player_id, Body(radius=0.4, height=1.4)) # Doom: 16 x 56 units
         # Phase 4: Init Stats for HUD
         self.world.add_component(self.player_id, Stats(hp=100, armor=0, ammo=50, fuel=100.0))
-        
-        # Load the level map
-        self.loader = WADLoader("assets/Doom1.WAD")
-        self.load_wad_assets()
-        self.load_level("E1M1")
-        
-        # Add systems
-        self.world.add_system(input_system)
-        self.world.add_system(physics_system)
+        self.world.set_singleton("player", self.player_id)
+        return self.player_id
+
+    def start_output(self):
+        """Clear the screen and start the terminal output stage."""
+        # Clear screen and move cursor to top-left
+        sys.stdout.write("\033[2J\033[H")
+        sys.stdout.flush()
+        if self.output_thread and not self.headless:
+            self.writer = ThreadedTerminalWriter(self.width, self.height, self.full_repaint_ratio)
+        self.writer.invalidate()
+
+    def stop_output(self):
+        """Finish pending output (before the terminal is restored)."""
+        if isinstance(self.writer, ThreadedTerminalWriter):
+            self.writer.close()
+
+    def start_parallel_render(self):
+        """Spin up the raycast worker pool if render_workers is set."""
+        self.stop_parallel_render()
+        if self.render_workers > 0 and getattr(self.world, 'world_map', None) is not None:
+            from src.utils.parallel_raycast import ParallelRaycaster
+            self.parallel_raycaster = ParallelRaycaster(self.world, self.render_workers)
+            self.log(f"[*] Parallel raycasting: {self.render_workers} workers")
+
+    def stop_parallel_render(self):
+        if self.parallel_raycaster is not None:
+            self.parallel_raycaster.close()
+            self.parallel_raycaster = None
 
     def load_wad_assets(self):
         """Load Sprites (Weapons) from WAD and convert to ASCII."""
@@ -268,6 +381,214 @@ class GameEngine:
         except Exception as e:
             self.log(f"[!] Asset Load Error: {e}")
 
+    def tick(self, dt):
+        """One fixed simulation step (input + physics)."""
+        # Pose before the tick, for render interpolation
+        snapshot = self.prev_transforms
+        snapshot.clear()
+        for entity_id in self.world.get_entities_with(Transform):
+            t = self.world.get_component(entity_id, Transform)
+            snapshot[entity_id] = (t.pos.x, t.pos.y, t.pos.z, t.angle, t.pitch)
+
+        # Update logic
+        if self.input_cooldown > 0:
+            self.input_cooldown -= dt
+        self.world.update(dt, self)
+        self.metrics["active_bodies"] = self.world.active_body_count()
+
+    def interpolate_transforms(self, alpha):
+        """
+        Moves every Transform alpha of the way from its pre-tick pose to
+        its current one. Returns the current poses for restore_transforms().
+        """
+        saved = {}
+        for entity_id, (x, y, z, angle, pitch) in self.prev_transforms.items():
+            t = self.world.get_component(entity_id, Transform) if entity_id in self.world.entities else None
+            if t is None: continue
+            pos = t.pos
+            saved[entity_id] = (pos.x, pos.y, pos.z, t.angle, t.pitch)
+            pos.x = x + (pos.x - x) * alpha
+            pos.y = y + (pos.y - y) * alpha
+            pos.z = z + (pos.z - z) * alpha
+            t.angle = angle + (t.angle - angle) * alpha
+            t.pitch = pitch + (t.pitch - pitch) * alpha
+        return saved
+
+    def restore_transforms(self, saved):
+        for entity_id, (x, y, z, angle, pitch) in saved.items():
+            t = self.world.get_component(entity_id, Transform)
+            t.pos.x, t.pos.y, t.pos.z = x, y, z
+            t.angle, t.pitch = angle, pitch
+
+    def render_frame(self, dt, alpha=1.0):
+        """
+        Draw and output one frame. alpha < 1 renders transforms
+        interpolated between the previous and the latest tick.
+        """
+        profiler = self.world.profiler
+        saved = self.interpolate_transforms(alpha) if alpha < 1.0 else None
+        try:
+            # Render
+            self.clear_buffer()
+            if self.show_automap:
+                 profiler.call("render_automap", render_automap, self.world, self)
+            else:
+                 profiler.call("render_system", render_system, self.world, self, dt)
+                 profiler.call("ui_system", ui_system, self.world, self, dt) # Phase 4: UI Overlay
+        finally:
+            if saved:
+                self.restore_transforms(saved)
+        
+        input_arrival, self.input_arrival = self.input_arrival, None
+        profiler.call("output", self.render_to_terminal, input_arrival)
+
+        # Input latency: key arrival -> end of output of the first frame
+        # drawn after it was applied (the threaded writer measures it once
+        # os.write returned, so it shows up a frame or so later)
+        for latency in self.writer.take_input_latencies():
+            self.metrics["input_latency_ms"] = latency * 1000.0
+            if profiler.enabled:
+                profiler.record("input_latency", int(latency * 1e9))
+
+    def step(self, dt):
+        """
+        One tick and one frame (headless / benchmark stepping).
+        With the profiler enabled every stage is timed, and the last
+        frame's milliseconds per stage go to metrics["system_ms"].
+        """
+        profiler = self.world.profiler
+        t0 = time.perf_counter_ns() if profiler.enabled else 0
+        self.tick(dt)
+        self.render_frame(dt)
+        self.end_frame(t0)
+
+    def end_frame(self, t0):
+        profiler = self.world.profiler
+        if profiler.enabled and t0: # Not the frame that turned it on
+            profiler.record("frame", time.perf_counter_ns() - t0)
+            self.metrics["system_ms"] = profiler.last_ms()
+
+    def run_headless(self, frames, dt=1.0 / 30.0, on_frame=None):
+        """
+        Steps the game without a terminal (call init_game() or build a
+        map first). on_frame(engine, i) runs before each frame, e.g. to
+        feed_keys() or move the camera. Returns per-frame metrics dicts
+        with "frame_ms" added.
+        """
+        results = []
+        self.running = True
+        for i in range(frames):
+            if not self.running: break
+            if on_frame is not None:
+                on_frame(self, i)
+            t0 = time.perf_counter()
+            self.step(dt)
+            frame = dict(self.metrics)
+            frame["frame_ms"] = (time.perf_counter() - t0) * 1000.0
+            results.append(frame)
+        return results
+
+    def main_loop(self, clock=time.perf_counter, sleep=time.sleep):
+        """
+        Fixed-timestep loop: simulation ticks at tick_rate from an
+        accumulator, frames render at up to render_rate with transforms
+        interpolated between the last two ticks. Gameplay speed does not
+        depend on the render rate.
+        """
+        self.running = True
+        profiler = self.world.profiler
+        last_time = clock()
+        next_frame = last_time
+        accumulator = 0.0
+        
+        while self.running:
+            tick_dt = 1.0 / self.tick_rate
+            frame_dt = 1.0 / self.render_rate
+            now = clock()
+            t0 = time.perf_counter_ns() if profiler.enabled else 0
+            # Clamp long stalls (debugger, suspended terminal)
+            accumulator += min(now - last_time, 0.25)
+            last_time = now
+            
+            ticks = 0
+            while accumulator >= tick_dt and self.running:
+                self.tick(tick_dt)
+                accumulator -= tick_dt
+                ticks += 1
+                if ticks >= self.max_ticks_per_frame:
+                    accumulator = min(accumulator, tick_dt) # Drop the backlog
+                    break
+            
+            if now >= next_frame:
+                self.render_frame(frame_dt, min(1.0, accumulator / tick_dt))
+                self.end_frame(t0)
+                next_frame += frame_dt
+                if next_frame < now: next_frame = now + frame_dt # Fell behind: don't burst
+            
+            # Sleep until the next tick or frame is due
+            wait = min(next_frame, now + tick_dt - accumulator) - clock()
+            if wait > 0:
+                sleep(wait)
+
+    async def async_main(self):
+        """
+        asyncio loop: stdin is parsed into key events the moment bytes
+        arrive (loop.add_reader), ticks and frames run as timed tasks.
+        """
+        loop = asyncio.get_running_loop()
+        fd = sys.stdin.fileno()
+        loop.add_reader(fd, self.read_stdin)
+        self.stdin_reader = True
+        self.running = True
+        self.last_tick_time = time.perf_counter()
+        try:
+            await asyncio.gather(self.tick_task(), self.render_task())
+        finally:
+            loop.remove_reader(fd)
+            self.stdin_reader = False
+
+    async def tick_task(self):
+        next_time = time.perf_counter()
+        while self.running:
+            tick_dt = 1.0 / self.tick_rate
+            ticks = 0
+            while next_time <= time.perf_counter() and ticks < self.max_ticks_per_frame and self.running:
+                self.tick(tick_dt)
+                self.last_tick_time = next_time
+                next_time += tick_dt
+                ticks += 1
+            if next_time < time.perf_counter() - 0.25:
+                next_time = time.perf_counter() # Stalled: drop the backlog
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+
+    async def render_task(self):
+        next_time = time.perf_counter()
+        while self.running:
+            frame_dt = 1.0 / self.render_rate
+            now = time.perf_counter()
+            t0 = time.perf_counter_ns() if self.world.profiler.enabled else 0
+            alpha = min(1.0, max(0.0, (now - self.last_tick_time) * self.tick_rate))
+            self.render_frame(frame_dt, alpha)
+            self.end_frame(t0)
+            next_time += frame_dt
+            if next_time < now: next_time = now + frame_dt
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+
+    def run_async(self):
+        """Same as run(), on the asyncio loop (see async_main)."""
+        try:
+            self.init_game()
+            self.setup_terminal()
+            self.start_output()
+            asyncio.run(self.async_main())
+        except KeyboardInterrupt:
+            self.running = False
+        finally:
+            self.stop_output()
+            self.stop_parallel_render()
+            self.world.close()
+            self.restore_terminal()
+
     def run(self):
         try:
             self.init_game()
@@ -275,50 +596,21 @@ class GameEngine:
             # self.render_debug_map() # 진단 완료 후 비활성
             
             self.setup_terminal()
-            # Clear screen and move cursor to top-left
-            sys.stdout.write("\033[2J\033[H")
-            sys.stdout.flush()
-            
-            self.running = True
+            self.start_output()
             
-            last_time = time.time()
-            
-            while self.running:
-                current_time = time.time()
-                dt = current_time - last_time
-                if dt < 0.01:
-                    time.sleep(0.01)
-                    continue
-                last_time = current_time
-                
-                # Update logic
-                if self.input_cooldown > 0:
-                    self.input_cooldown -= dt
-                self.world.update(dt, self)
-                
-                # Render
-                self.clear_buffer()
-                if self.show_automap:
-                     from src.systems.render_sys import render_automap
-                     render_automap(self.world, self)
-                else:
-                     render_system(self.world, self, dt)
-                     ui_system(self.world, self, dt) # Phase 4: UI Overlay
-                
-                self.render_to_terminal()
-                
-                # Cap FPS (approx 30 FPS)
-                sleep_time = 0.033 - (time.time() - current_time)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+            self.main_loop()
                 
         except KeyboardInterrupt:
             self.running = False
         except Exception as e:
+            self.stop_output()
             self.restore_terminal()
             print(f"\nEngine error: {e}")
             raise e
         finally:
+            self.stop_output()
+            self.stop_parallel_render()
+            self.world.close()
             self.restore_terminal()
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+from src.ecs.components import Transform, Motion, Body
+from src.systems.physics_sys import SLEEP_SPEED
+
+def sync_spatial_hash(world):
+    """
+    Refresh world.spatial_hash from Transform + Body. Bodies that stayed
+    in their cell only get their coordinates replaced; entities that lost
+    either component (or were removed) are dropped.
+    """
+    grid = world.spatial_hash
+    members = world.query(Transform, Body)
+    if members is not world.spatial_members:
+        alive = set(members)
+        for entity_id in [e for e in grid.bodies if e not in alive]:
+            grid.remove(entity_id)
+        world.spatial_members = members
+    transforms = world.components[Transform]
+    bodies = world.components[Body]
+    update = grid.update
+    for entity_id in members:
+        pos = transforms[entity_id].pos
+        body = bodies[entity_id]
+        update(entity_id, pos.x, pos.y, pos.z, body.radius, body.height)
+    world.ray_cache.clear() # Body hits may have moved
+
+def collision_system(world, engine, dt):
+    """Entity-vs-entity broadphase: world.contacts = overlapping body pairs."""
+    if Body not in world.components:
+        world.contacts = []
+        return
+    sync_spatial_hash(world)
+    world.contacts = contacts = world.spatial_hash.contact_pairs()
+    # A contact with a moving body wakes a sleeping one (an awake body at
+    # rest does not, or touching bodies would keep each other awake)
+    sleeping = world.sleeping
+    if sleeping:
+        for a, b in contacts:
+            if (a in sleeping) != (b in sleeping):
+                sleeper, other = (a, b) if a in sleeping else (b, a)
+                motion = world.get_component(other, Motion)
+                if motion is None: continue
+                vel = motion.vel
+                if abs(vel.x) >= SLEEP_SPEED or abs(vel.y) >= SLEEP_SPEED or abs(vel.z) >= SLEEP_SPEED:
+                    world.wake(sleeper)
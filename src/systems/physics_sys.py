@@ -1,12 +1,57 @@
-from src.ecs.components import Transform, Motion, PhysicsMode, PhysicsModeType
+from array import array
+from src.ecs.components import Transform, Motion, PhysicsMode, PhysicsModeType, Body
+from src.ecs.world import HAS_TRANSFORM, HAS_MOTION
+from src.utils.raycast import sweep_circle
+
+# Impacts resolved per entity per tick in ZERO_G (bounded cost at any speed)
+MAX_BOUNCES = 3
+
+# A body slower than this on every axis for world.sleep_ticks ticks in a
+# row falls asleep (velocity zeroed, skipped until woken)
+SLEEP_SPEED = 0.005
+
+# Collision radius of entities without a Body
+# (slightly smaller than 0.5 to allow fitting in 1.0 holes)
+DEFAULT_RADIUS = 0.4
+
+def drift_move(grid, x, y, vx, vy, radius):
+    """
+    ZERO_G movement with swept collision, so fast bodies cannot tunnel
+    through thin walls. At each impact the body stops at the contact
+    point, the normal part of its velocity bounces back at half speed and
+    the rest of the move continues. Returns (x, y, vx, vy).
+    """
+    remaining = 1.0
+    for _ in range(MAX_BOUNCES + 1):
+        dx, dy = vx * remaining, vy * remaining
+        hit = sweep_circle(grid, x, y, dx, dy, radius)
+        if hit is None:
+            return x + dx, y + dy, vx, vy
+        t, nx, ny = hit
+        x += dx * t
+        y += dy * t
+        vn = vx * nx + vy * ny
+        if vn < 0.0:
+            vx -= 1.5 * vn * nx
+            vy -= 1.5 * vn * ny
+        remaining *= 1.0 - t
+    return x, y, vx, vy
 
 def physics_system(world, engine, dt):
     """Grid-based movement and collision."""
     world_map = getattr(world, 'world_map', None)
-    if not world_map:
+    if world_map is None:
+        return
+    if getattr(world, 'soa', None) is not None:
+        physics_batch(world, world.soa, dt, world_map)
         return
+    body_of = world.components.get(Body, {}).get
+    sleeping, rest = world.sleeping, world.rest_ticks
+    sleep_ticks = world.sleep_ticks
         
     for entity_id in world.get_entities_with(Transform, Motion):
+        if entity_id in sleeping:
+            continue
         transform = world.get_component(entity_id, Transform)
         motion = world.get_component(entity_id, Motion)
         phys_mode = world.get_component(entity_id, PhysicsMode)
@@ -24,14 +69,13 @@ def physics_system(world, engine, dt):
                 gravity = 0.0
                 motion.friction = 0.95 # Drift in Zero-G
         
-        motion.vel.z += gravity
-        motion.vel.x *= motion.friction
-        motion.vel.y *= motion.friction
-        motion.vel.z *= motion.friction
+        vel = motion.vel
+        vel.z += gravity
+        vel.scale_inplace(motion.friction)
 
         # Head Bobbing Logic
         # Calculate horizontal speed
-        h_speed = (motion.vel.x**2 + motion.vel.y**2)**0.5
+        h_speed = (vel.x**2 + vel.y**2)**0.5
         if h_speed > 0.01 and phys_mode.mode == PhysicsModeType.NORMAL:
              # Frequency: 10.0, Speed scalar
              motion.bob_timer += 10.0 * dt
@@ -41,64 +85,177 @@ def physics_system(world, engine, dt):
              pass
         
         # Proposed new position
-        new_x = transform.pos.x + motion.vel.x
-        new_y = transform.pos.y + motion.vel.y
-        new_z = transform.pos.z + motion.vel.z
+        pos = transform.pos
+        new_x = pos.x + vel.x
+        new_y = pos.y + vel.y
+        new_z = pos.z + vel.z
         
         # Collision Check (Box-based)
         # We must check the range of the player's body against grid cells.
-        radius = 0.4 # Slightly smaller than 0.5 to allow fitting in 1.0 holes
-        
-        # Helper to check if a range of Y intersects any walls at X
-        def is_wall_in_range_x(grid_x, min_y, max_y):
-            if not (0 <= grid_x < world.map_width): return True
-            start_y = int(min_y)
-            end_y = int(max_y)
-            for y in range(start_y, end_y + 1):
-                if 0 <= y < world.map_height:
-                    if world.world_map[grid_x][y] > 0: return True
-            return False
-
-        # Helper for X range at Y
-        def is_wall_in_range_y(grid_y, min_x, max_x):
-            if not (0 <= grid_y < world.map_height): return True
-            start_x = int(min_x)
-            end_x = int(max_x)
-            for x in range(start_x, end_x + 1):
-                if 0 <= x < world.map_width:
-                    if world.world_map[x][grid_y] > 0: return True
-            return False
-
-        # Check X
-        check_x_edge = new_x + (radius if motion.vel.x > 0 else -radius)
-        grid_x = int(check_x_edge)
-        # Check vertical range (shoulders)
-        if not is_wall_in_range_x(grid_x, transform.pos.y - radius + 0.1, transform.pos.y + radius - 0.1):
-             transform.pos.x = new_x
-        else:
-             if phys_mode and phys_mode.mode == PhysicsModeType.ZERO_G:
-                motion.vel.x *= -0.5
-             else:
-                motion.vel.x = 0
-                
-        # Check Y
-        check_y_edge = new_y + (radius if motion.vel.y > 0 else -radius)
-        grid_y = int(check_y_edge)
-        # Check horizontal range (shoulders)
-        if not is_wall_in_range_y(grid_y, transform.pos.x - radius + 0.1, transform.pos.x + radius - 0.1):
-             transform.pos.y = new_y
+        body = body_of(entity_id)
+        radius = body.radius if body is not None else DEFAULT_RADIUS
+
+        if phys_mode and phys_mode.mode == PhysicsModeType.ZERO_G:
+            # Drifting: swept circle against the grid (exact at any speed)
+            pos.x, pos.y, vel.x, vel.y = drift_move(world_map, pos.x, pos.y, vel.x, vel.y, radius)
         else:
-             if phys_mode and phys_mode.mode == PhysicsModeType.ZERO_G:
-                motion.vel.y *= -0.5
-             else:
-                motion.vel.y = 0
+            # Wall runs for this radius: one lookup per axis
+            collision = world.collision_grid(radius)
+            # Check X
+            check_x_edge = new_x + (radius if vel.x > 0 else -radius)
+            grid_x = int(check_x_edge)
+            # Check vertical range (shoulders)
+            if not collision.blocked_x(grid_x, pos.y - radius + 0.1, pos.y + radius - 0.1):
+                 pos.x = new_x
+            else:
+                 vel.x = 0
+
+            # Check Y
+            check_y_edge = new_y + (radius if vel.y > 0 else -radius)
+            grid_y = int(check_y_edge)
+            # Check horizontal range (shoulders)
+            if not collision.blocked_y(grid_y, pos.x - radius + 0.1, pos.x + radius - 0.1):
+                 pos.y = new_y
+            else:
+                 vel.y = 0
 
         # Update Z with floor/ceiling limits (scaled)
         if new_z < 0:
-            transform.pos.z = 0
-            motion.vel.z = 0
+            pos.z = 0
+            vel.z = 0
         elif new_z > 30.0: # Ceiling for SCALE=0.2
-            transform.pos.z = 30.0
-            motion.vel.z = 0
+            pos.z = 30.0
+            vel.z = 0
         else:
-            transform.pos.z = new_z
+            pos.z = new_z
+
+        # Sleep after sleep_ticks still ticks
+        if sleep_ticks:
+            if -SLEEP_SPEED < vel.x < SLEEP_SPEED and -SLEEP_SPEED < vel.y < SLEEP_SPEED \
+                    and -SLEEP_SPEED < vel.z < SLEEP_SPEED:
+                n = rest.get(entity_id, 0) + 1
+                if n >= sleep_ticks:
+                    world.sleep(entity_id)
+                else:
+                    rest[entity_id] = n
+            elif entity_id in rest:
+                del rest[entity_id]
+
+def physics_batch(world, store, dt, world_map):
+    """
+    physics_system over SoA columns (World(soa=True)). Each step is one
+    pass over whole columns (list comprehensions, no per-entity Python
+    loop), with the same math and order of float operations as the
+    per-entity path, so both give bit-identical results.
+    Sleeping slots and slots without both components are left out: the
+    columns are gathered for the simulated slots only and scattered back.
+    """
+    n = store.count
+    if n == 0: return
+    map_w, map_h = world_map.width, world_map.height
+    NORMAL, ZERO_G, INVERTED = PhysicsModeType.NORMAL, PhysicsModeType.ZERO_G, PhysicsModeType.INVERTED
+    both = HAS_TRANSFORM | HAS_MOTION
+    sleeping, rest = world.sleeping, world.rest_ticks
+    sleep_ticks = world.sleep_ticks
+
+    # Simulated slots (None = all of them)
+    if sleeping or store.flags.count(both) != n:
+        idx = [i for i, (f, e) in enumerate(zip(store.flags, store.entity)) if f == both and e not in sleeping]
+        if not idx: return
+        gather = lambda col: [col[i] for i in idx]
+        entity = gather(store.entity)
+    else:
+        idx = None
+        gather = list
+        entity = store.entity
+
+    # Collision radius per slot, and the wall runs for each distinct radius
+    body_of = world.components.get(Body, {}).get
+    rad = [b.radius if b is not None else DEFAULT_RADIUS for b in map(body_of, entity)]
+    grids = {r: world.collision_grid(r) for r in set(rad)}
+
+    # Physics mode per slot (-1 = none)
+    mode_of = world.components.get(PhysicsMode, {}).get
+    mode = [m.mode if m is not None else -1 for m in map(mode_of, entity)]
+
+    # Gravity + friction
+    g_down, g_up = -25.0 * dt, 25.0 * dt
+    fric = [0.5 if md == NORMAL or md == INVERTED else (0.95 if md == ZERO_G else f)
+            for md, f in zip(mode, gather(store.friction))]
+    vx = [v * f for v, f in zip(gather(store.vel_x), fric)]
+    vy = [v * f for v, f in zip(gather(store.vel_y), fric)]
+    vz = [(v + (g_down if md == NORMAL else (g_up if md == INVERTED else 0.0))) * f
+          for v, md, f in zip(gather(store.vel_z), mode, fric)]
+
+    # Head Bobbing
+    bob_step = 10.0 * dt
+    bob = [b + bob_step if md == NORMAL and (x**2 + y**2)**0.5 > 0.01 else b
+           for b, md, x, y in zip(gather(store.bob_timer), mode, vx, vy)]
+
+    # Check X: Y range of the shoulders at the leading X edge
+    # (one read of the radius' vertical wall runs; map edges take the slow path)
+    px0, py0 = gather(store.pos_x), gather(store.pos_y)
+    vx_drift, vy_drift = vx, vy
+    new_x = [p + v for p, v in zip(px0, vx)]
+    runs = [grids[r].runs_v for r in rad]
+    hit = [runs_r[y1 - y0 + 1][y0 * map_w + gx] != 0
+           if 0 <= gx < map_w and 0 <= y0 <= y1 < map_h and y1 - y0 + 1 < len(runs_r)
+           else grids[r].blocked_x(gx, y0, y1)
+           for gx, y0, y1, r, runs_r in zip([int(x + (r if v > 0 else -r)) for x, v, r in zip(new_x, vx, rad)],
+                                            [int(p - r + 0.1) for p, r in zip(py0, rad)],
+                                            [int(p + r - 0.1) for p, r in zip(py0, rad)],
+                                            rad, runs)]
+    px = [p if h else x for p, x, h in zip(px0, new_x, hit)]
+    vx = [0 if h else v for v, h in zip(vx, hit)]
+
+    # Check Y: X range of the shoulders at the leading Y edge (new X)
+    new_y = [p + v for p, v in zip(py0, vy)]
+    runs = [grids[r].runs_h for r in rad]
+    hit = [runs_r[x1 - x0 + 1][gy * map_w + x0] != 0
+           if 0 <= gy < map_h and 0 <= x0 <= x1 < map_w and x1 - x0 + 1 < len(runs_r)
+           else grids[r].blocked_y(gy, x0, x1)
+           for gy, x0, x1, r, runs_r in zip([int(y + (r if v > 0 else -r)) for y, v, r in zip(new_y, vy, rad)],
+                                            [int(p - r + 0.1) for p, r in zip(px, rad)],
+                                            [int(p + r - 0.1) for p, r in zip(px, rad)],
+                                            rad, runs)]
+    py = [p if h else y for p, y, h in zip(py0, new_y, hit)]
+    vy = [0 if h else v for v, h in zip(vy, hit)]
+
+    # ZERO_G slots: swept movement instead (per slot, as in physics_system)
+    for i, md in enumerate(mode):
+        if md == ZERO_G:
+            px[i], py[i], vx[i], vy[i] = drift_move(world_map, px0[i], py0[i], vx_drift[i], vy_drift[i], rad[i])
+
+    # Z with floor/ceiling limits
+    new_z = [p + v for p, v in zip(gather(store.pos_z), vz)]
+    vz = [0 if z < 0 or z > 30.0 else v for z, v in zip(new_z, vz)]
+    pz = [0 if z < 0 else (30.0 if z > 30.0 else z) for z in new_z]
+
+    # Sleep after sleep_ticks still ticks
+    if sleep_ticks:
+        s = SLEEP_SPEED
+        still = {}
+        for k, (x, y, z) in enumerate(zip(vx, vy, vz)):
+            if -s < x < s and -s < y < s and -s < z < s:
+                still[entity[k]] = k
+        for e in [e for e in rest if e not in still]:
+            del rest[e]
+        for e, k in still.items():
+            ticks = rest.get(e, 0) + 1
+            if ticks >= sleep_ticks:
+                vx[k] = vy[k] = vz[k] = 0.0
+                sleeping[e] = None
+                rest.pop(e, None)
+            else:
+                rest[e] = ticks
+
+    new_columns = ((store.pos_x, px), (store.pos_y, py), (store.pos_z, pz),
+                   (store.vel_x, vx), (store.vel_y, vy), (store.vel_z, vz),
+                   (store.friction, fric), (store.bob_timer, bob))
+    if idx is None:
+        for col, values in new_columns:
+            col[:] = array('d', values)
+    else:
+        for col, values in new_columns:
+            for i, v in zip(idx, values):
+                col[i] = v
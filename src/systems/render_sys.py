@@ -1,14 +1,19 @@
-import math
+from array import array
 from src.ecs.components import Transform
-from src.utils.math_core import get_sin, get_cos, PI
+from src.utils.math_core import PI, get_ray_table
 from src.utils.visual_assets import ANSI_COLORS
-from src.utils.ascii_texture_gen import generate_ascii_texture
+from src.utils.ascii_texture_gen import make_texture_record
+from src.utils.raycast import select_caster, cast_columns, RECORD_SIZE, FLAG_FLIP
+from src.utils.strip_cache import StripCache, glyph_strip
+
+# Texture ids past the end of the registry
+_UNKNOWN_TEXTURE = make_texture_record("UNKNOWN", "##++", ANSI_COLORS["WHITE"])
 
 def render_system(world, engine, dt):
     """
     Textured Raycasting + Scanline Floor.
     """
-    player_id = next(world.get_entities_with(Transform), None)
+    player_id = world.singleton("player", Transform)
     if player_id is None: return
 
     transform = world.get_component(player_id, Transform)
@@ -18,9 +23,9 @@ def render_system(world, engine, dt):
     # DEBUG: Print Player Pos and Map Check ONCE
     if not hasattr(engine, "_debug_render_once"):
         world_map = getattr(world, 'world_map', None)
-        mw = world.map_width if world_map else 0
-        mh = world.map_height if world_map else 0
-        grid_val = world_map[int(px)][int(py)] if world_map and 0 <= int(px) < mw and 0 <= int(py) < mh else "OOB"
+        mw = world.map_width if world_map is not None else 0
+        mh = world.map_height if world_map is not None else 0
+        grid_val = world_map.get(int(px), int(py), "OOB") if world_map is not None else "OOB"
         print(f"[DEBUG] Render: Pos({px:.1f},{py:.1f}) MapW:{mw} MapH:{mh} GridAtPos:{grid_val}")
         
         # Check a few neighbors
@@ -28,7 +33,7 @@ def render_system(world, engine, dt):
         for dx in range(-2, 3):
             nx = int(px) + dx
             if 0 <= nx < mw:
-                 neighbors.append(str(world_map[nx][int(py)]))
+                 neighbors.append(str(world_map.get(nx, int(py))))
         print(f"[DEBUG] Neighbors X: {neighbors}")
         engine._debug_render_once = True
     
@@ -43,103 +48,63 @@ def render_system(world, engine, dt):
 
     # World Map is essential for Raycasting
     world_map = getattr(world, 'world_map', None)
-    if not world_map: return
-    map_w, map_h = world.map_width, world.map_height
-
-    # Texture Patterns (The Converter Logic)
-    # Map Texture ID -> ASCII String Pattern
-    TEXTURE_ASSET = {
-         1: "##==##==++..++..", # Brick / Brown
-         2: "||//||//||--||--", # Metal / Grey
-         3: "[]..[]..##  ##  ", # Door / Silver
-         "DEFAULT": "10101010010010111001010100101010##+==+##"
-    }
+    if world_map is None: return
+    # Traversal engine (dda / sdf / mip), selectable at runtime
+    cast, mode = select_caster(world, getattr(engine, 'raycast_mode', "auto"))
+    engine.metrics["raycast_mode"] = mode
 
     # 1. Scanline Floor/Ceiling
+    fb = engine.frame_buffer
     for y in range(engine.height):
         # Floor (Scanline)
         if y > horizon and y % 2 == 0:
              # Scanline Floor
-             fill = ANSI_COLORS["DIM_GREY"] + "-" + ANSI_COLORS["RESET"]
-             engine.frame_buffer[y] = [fill] * engine.width
+             fb.fill_row(y, "-", ANSI_COLORS["DIM_GREY"])
         # Ceiling (Empty)
         else:
-             engine.frame_buffer[y] = [" "] * engine.width
+             fb.fill_row(y, " ")
 
     # 2. Raycasting
     FOV = PI / 2.0
-    half_fov = FOV / 2.0
-    step_angle = FOV / engine.width
-    start_angle = pa - half_fov
+    rays = get_ray_table(engine.width, FOV)
+    ray_dirs_x, ray_dirs_y = rays.rotate(pa)
+    fisheye = rays.fisheye
 
+    # Pass 1: hit records for every column (in-process or worker pool)
+    parallel = getattr(engine, 'parallel_raycaster', None)
+    if parallel is not None and parallel.should_use(engine.width):
+        records, dda_iters = parallel.cast_frame(px, py, pa, engine.width, FOV, mode)
+        engine.metrics["render_parallel"] = True
+    else:
+        records = array('d')
+        dda_iters = cast_columns(cast, ray_dirs_x, ray_dirs_y, fisheye, px, py, 0, engine.width, records)
+        engine.metrics["render_parallel"] = False
+
+    # Pass 2: shading and composition
+    texture_registry = getattr(world, 'texture_registry', [])
+    n_textures = len(texture_registry)
+    resolved = {} # Name-only registry entries, resolved once per frame
+    strips = getattr(engine, 'strip_cache', None)
+    if strips is None:
+        strips = engine.strip_cache = StripCache()
+    hits0, misses0 = strips.hits, strips.misses
     last_side = 0
     last_wall_dist = 0
 
     for x in range(engine.width):
-        debug_ray = (x == engine.width // 2) and not hasattr(engine, "_debug_ray_done")
-        
-        ray_angle = start_angle + x * step_angle
-        ray_dir_x = get_cos(ray_angle)
-        ray_dir_y = get_sin(ray_angle)
-        
-        # DDA Init
-        map_x, map_y = int(px), int(py)
-        
-        delta_dist_x = abs(1 / ray_dir_x) if ray_dir_x != 0 else 1e30
-        delta_dist_y = abs(1 / ray_dir_y) if ray_dir_y != 0 else 1e30
-        
-        step_x = -1 if ray_dir_x < 0 else 1
-        side_dist_x = (px - map_x) * delta_dist_x if ray_dir_x < 0 else (map_x + 1.0 - px) * delta_dist_x
-        
-        step_y = -1 if ray_dir_y < 0 else 1
-        side_dist_y = (py - map_y) * delta_dist_y if ray_dir_y < 0 else (map_y + 1.0 - py) * delta_dist_y
+        base = x * RECORD_SIZE
+        tex_id = int(records[base + 2])
+        hit = tex_id > 0
         
-        hit = False
-        side = 0 # 0: NS, 1: EW
-        tex_id = 1
-        
-        # Determine max depth to avoid infinite loop
-        # Map is ~1000 wide. 60 was too short!
-        max_depth = 2000
-        for _ in range(max_depth):
-            if side_dist_x < side_dist_y:
-                side_dist_x += delta_dist_x
-                map_x += step_x
-                side = 0
-            else:
-                side_dist_y += delta_dist_y
-                map_y += step_y
-                side = 1
-                
-            if 0 <= map_x < map_w and 0 <= map_y < map_h:
-                val = world_map[map_x][map_y]
-                if val > 0:
-                    hit = True
-                    tex_id = val
-                    break
-            else:
-                break
-        
-        if debug_ray:
-             print(f"[DEBUG] Center Ray: Hit={hit} Map({map_x},{map_y}) Side={side} Depth={_}")
+        if x == engine.width // 2 and not hasattr(engine, "_debug_ray_done"):
+             print(f"[DEBUG] Center Ray: Hit={hit} Tex={tex_id} Dist={records[base]:.2f} Iters={dda_iters}")
              engine._debug_ray_done = True
 
         if hit:
-            # Calc perp dist
-            if side == 0:
-                perp_wall_dist = (map_x - px + (1 - step_x) / 2) / ray_dir_x
-            else:
-                perp_wall_dist = (map_y - py + (1 - step_y) / 2) / ray_dir_y
-            
-            # Correction for fisheye
-            # perp_wall_dist *= math.cos(pa - ray_angle) 
-            # Note: Math core cos/sin might already be doing something? 
-            # Or standard DDA perp_wall_dist IS the corrected distance if using camera plane.
-            # But here we used rayDir directly.
-            # Correction:
-            perp_wall_dist *= math.cos(pa - ray_angle)
-
-            if perp_wall_dist < 0.1: perp_wall_dist = 0.1
+            perp_wall_dist = records[base]
+            side_flags = int(records[base + 1])
+            side = side_flags & 1 # 0: NS, 1: EW
+            wall_x = records[base + 3]
             
             # Wall Height (Vertical Scaling applied)
             # Doom Rule: Wall Height ~20x Grid Unit (128/5)
@@ -153,74 +118,56 @@ def render_system(world, engine, dt):
             draw_start_clamped = max(0, draw_start)
             draw_end_clamped = min(engine.height, draw_end)
             
-            # Wall X (Texture Mapping)
-            if side == 0:
-                wall_x = py + perp_wall_dist * ray_dir_y
-            else:
-                wall_x = px + perp_wall_dist * ray_dir_x
-            
-            wall_x -= math.floor(wall_x)
-            
-            # Select Texture Pattern (Procedural)
-            pattern = "##++"
-            wall_color = ANSI_COLORS["WHITE"]
-            
-            # Lookup texture name from registry
-            texture_registry = getattr(world, 'texture_registry', [])
-            if 0 < tex_id < len(texture_registry):
-                tex_name = texture_registry[tex_id]
-                pattern, wall_color = generate_ascii_texture(tex_name)
+            # Select Texture Pattern (resolved at registration)
+            texture = texture_registry[tex_id] if tex_id < n_textures else _UNKNOWN_TEXTURE
+            if texture.__class__ is str:
+                # Registered by name only (e.g. after load): resolve here
+                name = texture
+                texture = resolved.get(name)
+                if texture is None:
+                    texture = resolved[name] = make_texture_record(name)
+            wall_color = texture.color
             
-            tex_width = len(pattern)
+            # Texture X (mirrored faces use the reversed pattern)
+            tex_x = int(wall_x * texture.width)
             
-            # Texture X
-            tex_x = int(wall_x * tex_width)
-            if side == 0 and ray_dir_x > 0: tex_x = tex_width - tex_x - 1
-            if side == 1 and ray_dir_y < 0: tex_x = tex_width - tex_x - 1
-            
-            # Draw Vertical Strip
-            for y in range(draw_start_clamped, draw_end_clamped):
-                # Matrix Style: Vertical texture mapping
-                # Slow down Y repitition to prevent barcode noise
-                # Use (tex_x) primarily, with slight Y offset for diagonal feel?
-                # Let's simple use column mapping for now for clean 'Texture' look
-                char_idx = tex_x % tex_width
-                
-                # Optional: Diagonal rain effect
-                # char_idx = (tex_x + (y // 2)) % tex_width
-                
-                char = pattern[char_idx]
-                
-                # Shading
-                # Distance based dimming
-                dim_char = char
-                if perp_wall_dist > 15.0:
-                    dim_char = "."
-                elif perp_wall_dist > 8.0:
-                    if y % 2 == 0: dim_char = ":"
-                    
+            # Draw Vertical Strip (span fills, not per cell)
+            # Matrix Style: Vertical texture mapping
+            # Use (tex_x) only for clean 'Texture' look
+            # Optional: Diagonal rain effect -> (tex_x + (y // 2)) % tex_width
+            char = texture.faces[1 if side_flags & FLAG_FLIP else 0][tex_x % texture.width]
+
+            # Side Shading (Darken Color)
+            # We can't easily darken ANSI codes without a lookup table,
+            # so side == 1 keeps the same color for now.
+            final_color = wall_color
+
+            # Composed strip, keyed by (glyph, height, dim glyph, row parity)
+            strip_h = draw_end_clamped - draw_start_clamped
+            if x > 0 and abs(perp_wall_dist - last_wall_dist) > 1.0:
                 # Edge highlight
-                if x > 0 and abs(perp_wall_dist - last_wall_dist) > 1.0:
-                    dim_char = "|"
-                
-                # Side Shading (Darken Color)
-                final_color = wall_color
-                if side == 1:
-                     # Simple logic: If white, make grey. If color, keep color but maybe dim char?
-                     # Let's just keep color constant but change char for side?
-                     # No, let's use ANSI DIM if available or just rely on char difference.
-                     # Actually we can't easily darken ANSI codes without a lookup table.
-                     pass 
-                
-                # Apply Texture Pattern
-                engine.frame_buffer[y][x] = final_color + dim_char + ANSI_COLORS["RESET"]
+                key = ("|", strip_h, None, 0)
+            elif perp_wall_dist > 15.0:
+                # Distance based dimming
+                key = (".", strip_h, None, 0)
+            elif perp_wall_dist > 8.0:
+                # Mid distance: dim every even row
+                key = (char, strip_h, ":", draw_start_clamped % 2)
+            else:
+                key = (char, strip_h, None, 0)
+            if strip_h > 0:
+                fb.put_column(x, draw_start_clamped, strips.get(key, glyph_strip), final_color)
             
             last_wall_dist = perp_wall_dist
             last_side = side
 
+    engine.metrics["dda_iters_per_ray"] = dda_iters / engine.width
+    engine.metrics["strip_hits"] = strips.hits - hits0
+    engine.metrics["strip_misses"] = strips.misses - misses0
+
 def render_automap(world, engine):
     """2D Top-down Mini-map Overlay."""
-    player_id = next(world.get_entities_with(Transform), None)
+    player_id = world.singleton("player", Transform)
     if not player_id: return
 
     transform = world.get_component(player_id, Transform)
@@ -234,6 +181,7 @@ def render_automap(world, engine):
 
     # Screen Center
     cx, cy = engine.width // 2, engine.height // 2
+    fb = engine.frame_buffer
     
     # -------------------------------------------------------------
     # DIAGNOSTIC BACKGROUND & BORDER
@@ -242,15 +190,15 @@ def render_automap(world, engine):
         for x in range(engine.width):
             # Background pattern to verify buffer coverage
             if x % 2 == 0 and y % 2 == 0:
-                engine.frame_buffer[y][x] = ANSI_COLORS["DIM_GREY"] + "·" + ANSI_COLORS["RESET"]
+                fb.put(x, y, "·", ANSI_COLORS["DIM_GREY"])
             
             # Border
             if x == 0 or x == engine.width - 1 or y == 0 or y == engine.height - 1:
-                engine.frame_buffer[y][x] = ANSI_COLORS["WHITE"] + "#" + ANSI_COLORS["RESET"]
+                fb.put(x, y, "#", ANSI_COLORS["WHITE"])
             
             # Center Crosshair (Player fixed position)
             if x == cx or y == cy:
-                engine.frame_buffer[y][x] = ANSI_COLORS["DARK_RED"] + "+" + ANSI_COLORS["RESET"]
+                fb.put(x, y, "+", ANSI_COLORS["DARK_RED"])
 
     # -------------------------------------------------------------
     # VECTOR RENDERING
@@ -286,20 +234,19 @@ def render_automap(world, engine):
                 
             sx1, sy1 = to_screen(gx1, gy1)
             sx2, sy2 = to_screen(gx2, gy2)
-            draw_line(engine, sx1, sy1, sx2, sy2, ANSI_COLORS["WHITE"] + "*" + ANSI_COLORS["RESET"])
+            draw_line(engine, sx1, sy1, sx2, sy2, "*", ANSI_COLORS["WHITE"])
 
     # Draw Stats at CENTER (to avoid scrolling off-screen)
     v_count = len(vertexes)
     l_count = len(linedefs)
     txt = f"[ AUTOMAP : V:{v_count} L:{l_count} ]"
     start_x = cx - (len(txt) // 2)
-    for i, c in enumerate(txt):
-        engine.frame_buffer[cy - 2][start_x + i] = ANSI_COLORS["WHITE"] + c + ANSI_COLORS["RESET"]
+    fb.text(start_x, cy - 2, txt, ANSI_COLORS["WHITE"])
     
     # Player Arrow
-    engine.frame_buffer[cy][cx] = ANSI_COLORS["BLOOD_RED"] + arrow + ANSI_COLORS["RESET"]
+    fb.put(cx, cy, arrow, ANSI_COLORS["BLOOD_RED"])
 
-def draw_line(engine, x0, y0, x1, y1, char):
+def draw_line(engine, x0, y0, x1, y1, char, color=None):
     """Bresenham's Line Algo for Terminal Buffer."""
     dx = abs(x1 - x0)
     dy = abs(y1 - y0)
@@ -309,7 +256,7 @@ def draw_line(engine, x0, y0, x1, y1, char):
     
     while True:
         if 0 <= x0 < engine.width and 0 <= y0 < engine.height:
-            engine.frame_buffer[y0][x0] = char
+            engine.frame_buffer.put(x0, y0, char, color)
             
         if x0 == x1 and y0 == y1:
             break
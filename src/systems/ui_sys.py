@@ -1,18 +1,17 @@
-
-from src.ecs.components import Transform, Stats
+from src.ecs.components import Transform, Motion, Stats
 from src.utils.visual_assets import FACE_ASSETS, WEAPON_ASSETS, ANSI_COLORS
 
 def ui_system(world, engine, dt):
     """
     Renders the HUD and Weapon Overlay.
-    Modifies engine.frame_buffer directly.
+    Writes through the engine.frame_buffer cell API.
     """
     # 0. Crosshair (Horizon Aligned)
     cx = engine.width // 2
     
     # Calculate Horizon exactly as render_sys does
     # This ensures Crosshair points to the geometric center of 3D view
-    player_id = next(world.get_entities_with(Transform), None)
+    player_id = world.singleton("player", Transform)
     pitch_offset = 0
     if player_id:
         trans = world.get_component(player_id, Transform)
@@ -22,11 +21,13 @@ def ui_system(world, engine, dt):
     horizon_shift = 0 
     cy = (engine.height // 2) + pitch_offset
     
+    fb = engine.frame_buffer
+
     # Clamp to viewport
     hud_height = 6
     if 0 <= cx < engine.width and 0 <= cy < (engine.height - hud_height):
         # Use Bright White for max contrast
-        engine.frame_buffer[cy][cx] = ANSI_COLORS["WHITE"] + "+" + ANSI_COLORS["RESET"]
+        fb.put(cx, cy, "+", ANSI_COLORS["WHITE"])
 
     # 1. Weapon Overlay (Render BEFORE HUD)
     # -------------------------------------
@@ -45,20 +46,12 @@ def ui_system(world, engine, dt):
         # X: Center
         start_x = (engine.width // 2) - (sprite_w // 2)
         
-        for r, row_str in enumerate(weapon_sprite):
-            draw_y = start_y + r
-            if 0 <= draw_y < (engine.height - hud_height):
-                for c, char in enumerate(row_str):
-                    draw_x = start_x + c
-                    if 0 <= draw_x < engine.width:
-                        # WAD Converter uses " " for transparent?
-                        # Check wad_loader: it returns " " for None.
-                        if char != " ": 
-                            engine.frame_buffer[draw_y][draw_x] = char
+        # WAD Converter returns " " for transparent pixels
+        fb.blit(start_x, start_y, weapon_sprite, transparent=" ", max_y=engine.height - hud_height)
 
     # 2. HUD Logic (Bottom Area)
     # --------------------------
-    player_id = next(world.get_entities_with(Stats), None)
+    player_id = world.singleton("player", Stats)
     hp = 0
     max_hp = 100
     ammo = 0
@@ -92,20 +85,13 @@ def ui_system(world, engine, dt):
         else:
              line_str = "|" + " " * (engine.width - 2) + "|"
              
-        for x, char in enumerate(line_str):
-            if x < engine.width:
-                engine.frame_buffer[y][x] = char
+        fb.text(0, y, line_str)
 
     # Draw Data
     # Helper to write string at pos
     def draw_text(x, y, text, color=None):
-        if y >= engine.height or y < 0: return
-        for i, char in enumerate(text):
-            if x + i < engine.width - 1:
-                # Apply color if given, but remember frame_buffer stores strings
-                # Assuming raw terminal output handle ANSI
-                 val = (color + char + ANSI_COLORS["RESET"]) if color else char
-                 engine.frame_buffer[y][x + i] = val
+        # Keep the right border intact
+        fb.text(x, y, text, color, max_x=engine.width - 1)
 
     # AMMO
     draw_text(3, hud_start_y + 1, "AMMO")
@@ -126,3 +112,35 @@ def ui_system(world, engine, dt):
     for r, row_str in enumerate(face_sprite):
         draw_text(face_x, face_y + r, row_str)
 
+    # PROFILER (between HEALTH and the face)
+    if getattr(engine, 'show_profiler', False):
+        draw_profiler_overlay(world, engine, 28, hud_start_y + 1, face_x - 2)
+
+def draw_profiler_overlay(world, engine, x, y, max_x):
+    """Compact stats: ms per stage, raycast cost, output bytes, cache hit rates."""
+    fb = engine.frame_buffer
+    profiler = world.profiler
+    metrics = engine.metrics
+    color = ANSI_COLORS["SLIME_GREEN"]
+
+    last, mean, p95, worst = profiler.stats("frame")
+    stages = []
+    for stage in ("input_system", "physics_system", "render_system", "render_automap", "ui_system", "output"):
+        if stage in profiler.last:
+            stages.append(f"{stage.replace('_system', '')[:5]} {profiler.stats(stage)[1]:.2f}")
+
+    hits = metrics.get("strip_hits", 0)
+    misses = metrics.get("strip_misses", 0)
+    strip_rate = hits * 100 // (hits + misses) if hits + misses else 0
+    lines = [
+        f"FRAME {mean:6.2f}ms p95 {p95:6.2f} max {worst:6.2f}",
+        " ".join(stages) + f"  BODIES {metrics.get('active_bodies', 0)}/{len(world.query(Transform, Motion))}",
+        f"RAY {metrics.get('raycast_mode', '-')} {metrics.get('dda_iters_per_ray', 0.0):.1f} it/ray"
+        f"{' par' if metrics.get('render_parallel') else ''}  STRIP {strip_rate}% hit",
+        f"OUT {metrics.get('bytes_out', 0) / 1024:.1f}KB{' FULL' if metrics.get('full_repaint') else ''}"
+        f"  INPUT LAG {profiler.stats('input_latency')[1]:.1f}ms"
+        f"  DROP {metrics.get('dropped_frames', 0)} WR {metrics.get('write_latency_ms', 0.0):.1f}ms",
+    ]
+    for i, line in enumerate(lines):
+        fb.text(x, y + i, line, color, max_x=max_x)
+
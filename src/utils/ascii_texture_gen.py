@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from src.utils.visual_assets import ANSI_COLORS
 
 # Pattern Constants
@@ -52,3 +53,22 @@ def generate_ascii_texture(texture_name):
 
     # Fallback
     return PAT_BRICK, ANSI_COLORS["GREY_WALL"]
+
+@dataclass
+class TextureRecord:
+    """
+    A texture resolved once at registration time.
+    faces[flip] is the pattern as seen on a normal (0) or mirrored (1)
+    wall face, so the renderer indexes it with tex_x directly.
+    """
+    name: str
+    pattern: str
+    color: str
+    width: int
+    faces: tuple
+
+def make_texture_record(texture_name, pattern=None, color=None):
+    """Resolve a texture name (or an explicit pattern/color) into a TextureRecord."""
+    if pattern is None:
+        pattern, color = generate_ascii_texture(texture_name)
+    return TextureRecord(texture_name, pattern, color, len(pattern), (pattern, pattern[::-1]))
@@ -0,0 +1,80 @@
+def is_wall_in_range_x(cells, map_w, map_h, grid_x, min_y, max_y):
+    """Any wall in column grid_x between rows min_y..max_y?"""
+    if not (0 <= grid_x < map_w): return True
+    for y in range(int(min_y), int(max_y) + 1):
+        if 0 <= y < map_h:
+            if cells[y * map_w + grid_x] > 0: return True
+    return False
+
+def is_wall_in_range_y(cells, map_w, map_h, grid_y, min_x, max_x):
+    """Any wall in row grid_y between columns min_x..max_x?"""
+    if not (0 <= grid_y < map_h): return True
+    row = grid_y * map_w
+    for x in range(int(min_x), int(max_x) + 1):
+        if 0 <= x < map_w:
+            if cells[row + x] > 0: return True
+    return False
+
+class CollisionGrid:
+    """
+    Wall tests for one body radius as single lookups.
+    A moving body checks the cells at its leading edge across its
+    shoulders (radius - 0.1 either side of the center), i.e. a run of
+    consecutive cells whose length only depends on the radius (give or
+    take one). runs_v[n] flags every cell where any of the n cells from
+    it downwards (+y) is a wall, runs_h[n] the same rightwards (+x), so
+    is_wall_in_range_x/y become one read. Both are bytearrays in map
+    layout. update_cell() keeps them in sync with map edits.
+    """
+    def __init__(self, grid, radius):
+        self.grid = grid
+        self.radius = radius
+        self.max_run = max(1, int(2.0 * (radius - 0.1)) + 2)
+        self.rebuild()
+
+    def rebuild(self):
+        grid = self.grid
+        w, size = grid.width, grid.width * grid.height
+        solid = bytes(1 if c > 0 else 0 for c in grid.cells)
+        plane = int.from_bytes(solid, "little")
+        self.runs_v = [None] # Indexed by run length
+        self.runs_h = [None]
+        run_v = run_h = 0
+        for n in range(self.max_run):
+            # Cell i of (plane >> 8k) is cell i + k of the plane
+            run_v |= plane >> (8 * w * n)
+            run_h |= plane >> (8 * n) # Wraps into the next row; never read
+            self.runs_v.append(bytearray(run_v.to_bytes(size, "little")))
+            self.runs_h.append(bytearray(run_h.to_bytes(size, "little")))
+
+    def update_cell(self, x, y):
+        """Refresh the runs that include cell (x, y)."""
+        grid = self.grid
+        cells, w, h = grid.cells, grid.width, grid.height
+        for n in range(1, self.max_run + 1):
+            runs_v, runs_h = self.runs_v[n], self.runs_h[n]
+            for y0 in range(max(0, y - n + 1), y + 1):
+                runs_v[y0 * w + x] = any(cells[yy * w + x] > 0 for yy in range(y0, min(h, y0 + n)))
+            row = y * w
+            for x0 in range(max(0, x - n + 1), x + 1):
+                runs_h[row + x0] = any(cells[row + xx] > 0 for xx in range(x0, min(w, x0 + n)))
+
+    def blocked_x(self, grid_x, min_y, max_y):
+        """is_wall_in_range_x() for this map."""
+        grid = self.grid
+        w = grid.width
+        if not (0 <= grid_x < w): return True
+        y0, y1 = int(min_y), int(max_y)
+        if 0 <= y0 <= y1 < grid.height and y1 - y0 < self.max_run:
+            return self.runs_v[y1 - y0 + 1][y0 * w + grid_x] != 0
+        return is_wall_in_range_x(grid.cells, w, grid.height, grid_x, min_y, max_y)
+
+    def blocked_y(self, grid_y, min_x, max_x):
+        """is_wall_in_range_y() for this map."""
+        grid = self.grid
+        w = grid.width
+        if not (0 <= grid_y < grid.height): return True
+        x0, x1 = int(min_x), int(max_x)
+        if 0 <= x0 <= x1 < w and x1 - x0 < self.max_run:
+            return self.runs_h[x1 - x0 + 1][grid_y * w + x0] != 0
+        return is_wall_in_range_y(grid.cells, w, grid.height, grid_y, min_x, max_x)
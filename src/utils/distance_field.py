@@ -0,0 +1,97 @@
+# Byte translation: any texture id -> 1 (solid)
+_SOLID = bytes([0] + [1] * 255)
+
+class DistanceField:
+    """
+    Chebyshev distance (in cells) from every map cell to the nearest wall,
+    capped at max_dist. Cells outside the map count as walls, so every
+    cell within distance d - 1 of a cell with distance d is empty and
+    inside the map.
+
+    Computed by repeated 3x3 dilation of the wall mask. Each row is a big
+    int with one byte per cell, so a dilation step is a handful of int
+    ops per row and the per-cell hit counts can never carry into the
+    neighbouring byte.
+    """
+    def __init__(self, grid, max_dist=32):
+        self.grid = grid
+        self.width = grid.width
+        self.height = grid.height
+        self.max_dist = max_dist
+        self.dist = bytearray(self.width * self.height)
+        self.auto_mode = None # Caster picked for this map (raycast.auto_mode)
+        self.rebuild()
+
+    def rebuild(self):
+        self._compute(0, 0, self.width, self.height)
+
+    def open_fraction(self, min_dist):
+        """Fraction of the empty cells further than min_dist from any wall."""
+        dist = self.dist
+        empty = len(dist) - dist.count(0)
+        if empty == 0: return 0.0
+        near = sum(dist.count(d) for d in range(1, min_dist + 1))
+        return (empty - near) / empty
+
+    def update_cell(self, x, y):
+        """Refresh distances after cell (x, y) changed."""
+        r = self.max_dist
+        self._compute(max(0, x - r), max(0, y - r),
+                      min(self.width, x + r + 1), min(self.height, y + r + 1))
+
+    def _solid_row(self, y, x0, x1):
+        """Row y, columns [x0, x1) as 0/1 bytes."""
+        cells = self.grid.cells
+        row = cells[y * self.width + x0:y * self.width + x1]
+        if isinstance(row, bytearray):
+            return row.translate(_SOLID)
+        return bytes(1 if v else 0 for v in row)
+
+    def _compute(self, x0, y0, x1, y1):
+        """Recompute distances for the region [x0, x1) x [y0, y1)."""
+        w, h, cap = self.width, self.height, self.max_dist
+
+        # Source region: walls further than cap away cannot matter,
+        # plus a one cell margin standing in for 'outside the map'.
+        sx0, sy0 = max(0, x0 - cap), max(0, y0 - cap)
+        sx1, sy1 = min(w, x1 + cap), min(h, y1 + cap)
+        n = sx1 - sx0 + 2
+        left = b"\x01" if sx0 == 0 else b"\x00"
+        right = b"\x01" if sx1 == w else b"\x00"
+        low = int.from_bytes(b"\x01" * n, "little")
+        top = low if sy0 == 0 else 0
+        bottom = low if sy1 == h else 0
+
+        rows = [top]
+        for y in range(sy0, sy1):
+            rows.append(int.from_bytes(left + self._solid_row(y, sx0, sx1) + right, "little"))
+        rows.append(bottom)
+
+        # counts[i] = number of dilation levels k < cap that cover the cell
+        last = len(rows) - 1
+        counts = [0] * len(rows)
+        cur = rows
+        for k in range(cap):
+            for i in range(1, last):
+                counts[i] += cur[i]
+            if k == cap - 1:
+                break
+            if all(r == low for r in cur[1:last]):
+                rest = (cap - 1 - k) * low
+                for i in range(1, last):
+                    counts[i] += rest
+                break
+            grown = [(r | (r << 8) | (r >> 8)) & low for r in cur]
+            cur = [grown[0]]
+            for i in range(1, last):
+                cur.append(grown[i - 1] | grown[i] | grown[i + 1])
+            cur.append(grown[last])
+
+        # distance = cap - count
+        full = cap * low
+        a = x0 - sx0 + 1
+        b = x1 - sx0 + 1
+        dist = self.dist
+        for y in range(y0, y1):
+            row = (full - counts[y - sy0 + 1]).to_bytes(n, "little")
+            dist[y * w + x0:y * w + x1] = row[a:b]
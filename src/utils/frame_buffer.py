@@ -0,0 +1,243 @@
+import re
+import sys
+from array import array
+from functools import lru_cache
+from operator import ne, or_
+
+RESET = "\033[0m"
+BLANK = ord(" ")
+
+# Shared color palette: index -> SGR string (0 = terminal default)
+PALETTE = [None]
+_COLOR_IDS = {None: 0}
+
+# Glyph plane is raw UTF-32 codepoints, decoded in one go per run
+_UTF32 = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+# Runs of identical color indices
+_COLOR_RUN = re.compile(rb"(.)\1*", re.S)
+
+@lru_cache(maxsize=None)
+def _changed_runs(merge_gap):
+    """Regex matching runs of changed cells with short unchanged gaps."""
+    return re.compile(rb"\x01(?:\x00{0,%d}\x01)*" % merge_gap)
+
+def color_id(color):
+    """Palette index of an SGR string (registered on first use)."""
+    idx = _COLOR_IDS.get(color)
+    if idx is None:
+        idx = len(PALETTE)
+        if idx > 255:
+            raise ValueError("FrameBuffer palette is full (256 colors)")
+        PALETTE.append(color)
+        _COLOR_IDS[color] = idx
+    return idx
+
+def cursor_to(x, y):
+    """ANSI cursor positioning (1-based)."""
+    return f"\033[{y + 1};{x + 1}H"
+
+class FrameBuffer:
+    """
+    Screen cells in two preallocated planes:
+    - glyphs: array('I') of codepoints
+    - colors: bytearray of PALETTE indices
+    Both are row-major (index = y * width + x). Fill/blit/clear work on
+    slices of these planes and never rebuild them.
+    """
+    def __init__(self, width, height):
+        assert array("I").itemsize == 4
+        self.width = width
+        self.height = height
+        size = width * height
+        self.glyphs = array("I", [BLANK]) * size
+        self.colors = bytearray(size)
+        self._gmv = memoryview(self.glyphs)
+        self._gbytes = self._gmv.cast("B")
+        self._cmv = memoryview(self.colors)
+
+        # Clear source + per-value fill sources (one screen row each)
+        self._blank_glyphs = array("I", [BLANK]) * size
+        self._blank_colors = bytes(size)
+        self._glyph_fills = {}
+        self._color_fills = {}
+
+    def _glyph_fill(self, cp):
+        mv = self._glyph_fills.get(cp)
+        if mv is None:
+            mv = memoryview(array("I", [cp]) * max(self.width, self.height))
+            self._glyph_fills[cp] = mv
+        return mv
+
+    def _color_fill(self, cid):
+        mv = self._color_fills.get(cid)
+        if mv is None:
+            mv = memoryview(bytes([cid]) * max(self.width, self.height))
+            self._color_fills[cid] = mv
+        return mv
+
+    # ------------------------------------------------------------------
+    # Cell API
+    # ------------------------------------------------------------------
+    def clear(self):
+        self.glyphs[:] = self._blank_glyphs
+        self.colors[:] = self._blank_colors
+
+    def put(self, x, y, char, color=None):
+        """Write one cell (bounds-checked)."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = y * self.width + x
+            self.glyphs[i] = ord(char)
+            self.colors[i] = _COLOR_IDS.get(color) or color_id(color)
+
+    def get(self, x, y):
+        """Returns (char, color)."""
+        i = y * self.width + x
+        return chr(self.glyphs[i]), PALETTE[self.colors[i]]
+
+    def fill_row(self, y, char, color=None, x0=0, x1=None):
+        """Fill cells [x0, x1) of row y."""
+        if not (0 <= y < self.height): return
+        if x1 is None or x1 > self.width: x1 = self.width
+        if x0 < 0: x0 = 0
+        n = x1 - x0
+        if n <= 0: return
+        i0 = y * self.width + x0
+        self._gmv[i0:i0 + n] = self._glyph_fill(ord(char))[:n]
+        self._cmv[i0:i0 + n] = self._color_fill(color_id(color))[:n]
+
+    def fill_span(self, x, y0, y1, char, color=None, step=1):
+        """Fill cells [y0, y1) of column x (every step-th row)."""
+        if not (0 <= x < self.width): return
+        if y0 < 0: y0 = 0
+        if y1 > self.height: y1 = self.height
+        if y1 <= y0: return
+        n = (y1 - y0 + step - 1) // step
+        stride = self.width * step
+        i0 = y0 * self.width + x
+        i1 = i0 + (n - 1) * stride + 1
+        self._gmv[i0:i1:stride] = self._glyph_fill(ord(char))[:n]
+        self._cmv[i0:i1:stride] = self._color_fill(color_id(color))[:n]
+
+    def put_column(self, x, y0, glyphs, color=None):
+        """Write a prebuilt glyph strip (array('I')) down column x from row y0."""
+        if not (0 <= x < self.width): return
+        n = len(glyphs)
+        a = 0
+        if y0 < 0:
+            a = -y0
+            y0 = 0
+        if y0 + n - a > self.height:
+            n = self.height - y0 + a
+        if n <= a: return
+        w = self.width
+        i0 = y0 * w + x
+        i1 = i0 + (n - a - 1) * w + 1
+        self._gmv[i0:i1:w] = memoryview(glyphs)[a:n]
+        self._cmv[i0:i1:w] = self._color_fill(color_id(color))[:n - a]
+
+    def text(self, x, y, text, color=None, max_x=None):
+        """Write a string starting at (x, y), clipped at max_x (exclusive)."""
+        if not (0 <= y < self.height): return
+        limit = self.width if max_x is None else min(max_x, self.width)
+        cid = color_id(color)
+        row = y * self.width
+        glyphs, colors = self.glyphs, self.colors
+        for i, char in enumerate(text):
+            cx = x + i
+            if cx >= limit: break
+            if cx >= 0:
+                glyphs[row + cx] = ord(char)
+                colors[row + cx] = cid
+
+    def blit(self, x, y, rows, color=None, transparent=" ", max_y=None):
+        """Draw a sprite (list of strings); transparent chars are skipped."""
+        limit_y = self.height if max_y is None else min(max_y, self.height)
+        cid = color_id(color)
+        w = self.width
+        glyphs, colors = self.glyphs, self.colors
+        for r, row_str in enumerate(rows):
+            dy = y + r
+            if not (0 <= dy < limit_y): continue
+            base = dy * w
+            for c, char in enumerate(row_str):
+                dx = x + c
+                if 0 <= dx < w and char != transparent:
+                    glyphs[base + dx] = ord(char)
+                    colors[base + dx] = cid
+
+    def copy_from(self, other):
+        """In-place copy of another buffer of the same size."""
+        self.glyphs[:] = other.glyphs
+        self.colors[:] = other.colors
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    def diff_runs(self, prev, merge_gap=3):
+        """
+        Compares against prev (same size).
+        Returns ([(y, x_start, x_end)], changed_cell_count).
+        Unchanged gaps up to merge_gap cells are folded into one run.
+        """
+        w = self.width
+        g, c = self.glyphs, self.colors
+        pg, pc = prev.glyphs, prev.colors
+        gb, pgb = self._gbytes, prev._gbytes
+        run_re = _changed_runs(merge_gap)
+        runs = []
+        changed = 0
+        for y in range(self.height):
+            i0 = y * w
+            i1 = i0 + w
+            same_g = gb[i0 * 4:i1 * 4] == pgb[i0 * 4:i1 * 4]
+            same_c = c[i0:i1] == pc[i0:i1]
+            if same_g and same_c:
+                continue
+            # Per-cell change mask (1 = changed), built without a Python loop
+            if same_c:
+                mask = bytes(map(ne, g[i0:i1], pg[i0:i1]))
+            elif same_g:
+                mask = bytes(map(ne, c[i0:i1], pc[i0:i1]))
+            else:
+                mask = bytes(map(or_, map(ne, g[i0:i1], pg[i0:i1]), map(ne, c[i0:i1], pc[i0:i1])))
+            for m in run_re.finditer(mask):
+                start, end = m.span()
+                changed += end - start
+                runs.append((y, start, end))
+        return runs, changed
+
+    def _encode_span(self, parts, i0, i1, cur):
+        """Append cells [i0, i1) to parts, switching SGR only on color change."""
+        text = self._gmv[i0:i1].tobytes().decode(_UTF32)
+        colors = self.colors
+        for m in _COLOR_RUN.finditer(colors, i0, i1):
+            a, b = m.span()
+            cid = colors[a]
+            chunk = text[a - i0:b - i0]
+            # Blank cells look the same in any foreground color
+            if cid != cur and chunk.strip(" "):
+                parts.append(PALETTE[cid] or RESET)
+                cur = cid
+            parts.append(chunk)
+        return cur
+
+    def to_bytes(self, runs=None):
+        """
+        UTF-8 terminal encoding.
+        runs=None: full repaint from the top-left corner.
+        runs=[(y, x0, x1)]: only those cells, each behind a cursor jump.
+        """
+        w = self.width
+        parts = []
+        cur = 0
+        if runs is None:
+            parts.append("\033[H")
+            for y in range(self.height):
+                if y: parts.append("\r\n")
+                cur = self._encode_span(parts, y * w, y * w + w, cur)
+        else:
+            for y, x0, x1 in runs:
+                parts.append(cursor_to(x0, y))
+                cur = self._encode_span(parts, y * w + x0, y * w + x1, cur)
+        if cur: parts.append(RESET)
+        return "".join(parts).encode("utf-8")
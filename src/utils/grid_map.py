@@ -0,0 +1,44 @@
+from array import array
+
+class GridMap:
+    """
+    Rasterized world map in one flat row-major buffer.
+    Cell (x, y) lives at cells[y * width + x].
+    Stored as a bytearray while texture ids fit in a byte, promoted to
+    array('H') once a larger id is written.
+
+    Hot loops should read `cells` directly with their own index math
+    (no bounds checks); everything else goes through get/set.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y, default=0):
+        """Cell value, or default outside the map."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return default
+
+    def set(self, x, y, value):
+        """Write a cell (ignored outside the map)."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if value > 255 and isinstance(self.cells, bytearray):
+                self.cells = array("H", list(self.cells)) # Not the raw buffer
+            self.cells[y * self.width + x] = value
+
+    def is_solid(self, x, y):
+        """Outside the map counts as solid."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x] > 0
+        return True
+
+    @property
+    def nbytes(self):
+        if isinstance(self.cells, bytearray):
+            return len(self.cells)
+        return len(self.cells) * self.cells.itemsize
@@ -0,0 +1,52 @@
+import codecs
+
+ESC = "\x1b"
+# A lone ESC is only reported once nothing has followed it for this long
+ESC_TIMEOUT = 0.05
+
+class KeyParser:
+    """
+    Incremental terminal input parser. feed() takes raw bytes (or str) as
+    they arrive and appends (key, arrival_time) events to `events`, where
+    key is one character or a whole escape sequence such as "\\x1b[A".
+    Sequences split across reads are held until they complete.
+    """
+    def __init__(self, events):
+        self.events = events
+        self.pending = "" # Incomplete escape sequence
+        self.pending_since = 0.0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, data, now):
+        text = self._decoder.decode(data) if isinstance(data, (bytes, bytearray)) else data
+        events = self.events
+        for ch in text:
+            if self.pending:
+                seq = self.pending + ch
+                if len(seq) == 2:
+                    if ch in "[O":
+                        self.pending = seq
+                        continue
+                    # ESC + plain char: not a sequence
+                    self.pending = ""
+                    events.append((ESC, self.pending_since))
+                elif "\x40" <= ch <= "\x7e":
+                    # CSI / SS3 final byte
+                    self.pending = ""
+                    events.append((seq, self.pending_since))
+                    continue
+                else:
+                    self.pending = seq # Parameter bytes (e.g. "\x1b[1;5C")
+                    continue
+            if ch == ESC:
+                self.pending = ch
+                self.pending_since = now
+            else:
+                events.append((ch, now))
+
+    def flush_stale(self, now):
+        """Emit an escape prefix nothing has followed within ESC_TIMEOUT."""
+        if self.pending and now - self.pending_since >= ESC_TIMEOUT:
+            for ch in self.pending:
+                self.events.append((ch, self.pending_since))
+            self.pending = ""
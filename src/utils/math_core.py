@@ -19,11 +19,48 @@ def get_cos(angle_rad):
     idx = int((angle_rad % TWO_PI) * (LUT_SIZE / TWO_PI)) % LUT_SIZE
     return _cos_lut[idx]
 
+class RayTable:
+    """
+    Camera projection for one (width, FOV) configuration.
+    Per-column angle offsets and fisheye correction never change between
+    frames; only the rotation by the view angle does.
+    """
+    def __init__(self, width, fov):
+        self.width = width
+        self.fov = fov
+        step = fov / width
+        half_fov = fov / 2.0
+        self.offsets = [-half_fov + x * step for x in range(width)]
+        self.cos_off = [math.cos(o) for o in self.offsets]
+        self.sin_off = [math.sin(o) for o in self.offsets]
+        # cos(view_angle - ray_angle) == cos(offset)
+        self.fisheye = self.cos_off
+
+    def rotate(self, angle):
+        """Returns (dir_x list, dir_y list) for all columns at view angle."""
+        c = math.cos(angle)
+        s = math.sin(angle)
+        dir_x = [c * co - s * so for co, so in zip(self.cos_off, self.sin_off)]
+        dir_y = [s * co + c * so for co, so in zip(self.cos_off, self.sin_off)]
+        return dir_x, dir_y
+
+_ray_tables = {}
+
+def get_ray_table(width, fov):
+    """Cached RayTable keyed by (width, FOV)."""
+    key = (width, fov)
+    table = _ray_tables.get(key)
+    if table is None:
+        table = RayTable(width, fov)
+        _ray_tables[key] = table
+    return table
+
 def normalize_angle(angle):
     """Keep angle within [0, 2PI]."""
     return angle % TWO_PI
 
 class Vector3:
+    __slots__ = ("x", "y", "z") # No per-instance __dict__
     def __init__(self, x=0.0, y=0.0, z=0.0):
         self.x = x
         self.y = y
@@ -35,5 +72,48 @@ class Vector3:
     def __mul__(self, scalar):
         return Vector3(self.x * scalar, self.y * scalar, self.z * scalar)
 
+    def __repr__(self):
+        return f"Vector3({self.x}, {self.y}, {self.z})"
+
     def length(self):
         return math.sqrt(self.x**2 + self.y**2 + self.z**2)
+
+    # In-place operations (no new Vector3)
+    def set(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+        return self
+
+    def iadd_scaled(self, v, s):
+        """self += v * s"""
+        self.x += v.x * s
+        self.y += v.y * s
+        self.z += v.z * s
+        return self
+
+    def scale_inplace(self, s):
+        self.x *= s
+        self.y *= s
+        self.z *= s
+        return self
+
+class Vector3Pool:
+    """
+    Free list of scratch Vector3s for per-tick temporaries.
+    acquire() hands out a recycled vector (reset to the given value),
+    release() gives it back; nothing released is referenced afterwards.
+    """
+    def __init__(self):
+        self.free = []
+
+    def acquire(self, x=0.0, y=0.0, z=0.0):
+        if self.free:
+            return self.free.pop().set(x, y, z)
+        return Vector3(x, y, z)
+
+    def release(self, *vectors):
+        self.free.extend(vectors)
+
+# Shared pool for systems
+vec_pool = Vector3Pool()
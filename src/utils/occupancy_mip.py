@@ -0,0 +1,65 @@
+class OccupancyMip:
+    """
+    Occupancy pyramid over a GridMap.
+    levels[i] is a bytearray with one flag per block_sizes[i] x block_sizes[i]
+    block of cells (1 = the block contains at least one wall), row-major.
+    Block sizes are powers of two so cell -> block is a shift.
+    """
+    def __init__(self, grid, block_sizes=(8, 64)):
+        self.grid = grid
+        self.block_sizes = tuple(block_sizes)
+        self.shifts = tuple(b.bit_length() - 1 for b in self.block_sizes)
+        for b, s in zip(self.block_sizes, self.shifts):
+            assert b == 1 << s, "block sizes must be powers of two"
+        self.dims = [] # (blocks_w, blocks_h) per level
+        self.levels = []
+        for b in self.block_sizes:
+            bw = (grid.width + b - 1) // b
+            bh = (grid.height + b - 1) // b
+            self.dims.append((bw, bh))
+            self.levels.append(bytearray(bw * bh))
+        # (flags, blocks_w, shift, size) per level, coarsest first, for traversal
+        self.coarse_to_fine = [
+            (self.levels[i], self.dims[i][0], self.shifts[i], self.block_sizes[i])
+            for i in range(len(self.levels) - 1, -1, -1)
+        ]
+        self.rebuild()
+
+    def rebuild(self):
+        for i in range(len(self.levels)):
+            bw, bh = self.dims[i]
+            for by in range(bh):
+                for bx in range(bw):
+                    self._refresh_block(i, bx, by)
+
+    def update_cell(self, x, y):
+        """Refresh the blocks containing cell (x, y)."""
+        for i, s in enumerate(self.shifts):
+            self._refresh_block(i, x >> s, y >> s)
+
+    def _refresh_block(self, level, bx, by):
+        b = self.block_sizes[level]
+        bw = self.dims[level][0]
+        if level > 0 and b % self.block_sizes[level - 1] == 0:
+            # Coarser level: OR of the finer blocks it covers
+            fine = self.levels[level - 1]
+            fbw, fbh = self.dims[level - 1]
+            r = b // self.block_sizes[level - 1]
+            fx0 = bx * r
+            fx1 = min(fx0 + r, fbw)
+            solid = 0
+            for fy in range(by * r, min(by * r + r, fbh)):
+                if max(fine[fy * fbw + fx0:fy * fbw + fx1]):
+                    solid = 1
+                    break
+        else:
+            grid = self.grid
+            cells, w = grid.cells, grid.width
+            x0 = bx * b
+            x1 = min(x0 + b, w)
+            solid = 0
+            for y in range(by * b, min(by * b + b, grid.height)):
+                if max(cells[y * w + x0:y * w + x1]):
+                    solid = 1
+                    break
+        self.levels[level][by * bw + bx] = solid
@@ -0,0 +1,134 @@
+import os
+from array import array
+from functools import partial
+from multiprocessing import Pool, shared_memory
+from src.utils.math_core import get_ray_table
+from src.utils.raycast import cast_ray_dda, cast_ray_sdf, cast_columns
+
+class _GridView:
+    """GridMap-shaped view over shared memory (worker side)."""
+    def __init__(self, width, height, cells):
+        self.width = width
+        self.height = height
+        self.cells = cells
+
+class _FieldView:
+    """DistanceField-shaped view over shared memory (worker side)."""
+    def __init__(self, dist):
+        self.dist = dist
+
+# Worker process state, set once by _worker_init
+_worker = {}
+
+def _worker_init(names, width, height, typecode):
+    segments = {key: shared_memory.SharedMemory(name=name) for key, name in names.items()}
+    _worker["segments"] = segments # Keep mappings alive
+    cells = segments["cells"].buf
+    if typecode != "B":
+        cells = cells.cast(typecode)
+    _worker["grid"] = _GridView(width, height, cells)
+    _worker["field"] = _FieldView(segments["dist"].buf) if "dist" in segments else None
+
+def _cast_band(x0, x1, px, py, pa, width, fov, mode):
+    """Worker task: hit records for columns [x0, x1) as raw bytes."""
+    grid = _worker["grid"]
+    field = _worker["field"]
+    if mode in ("sdf", "mip") and field is not None:
+        cast = partial(cast_ray_sdf, grid, field)
+    else:
+        cast = partial(cast_ray_dda, grid)
+    table = get_ray_table(width, fov)
+    dirs_x, dirs_y = table.rotate(pa)
+    out = array('d')
+    iters = cast_columns(cast, dirs_x, dirs_y, table.fisheye, px, py, x0, x1, out)
+    return out.tobytes(), iters
+
+class ParallelRaycaster:
+    """
+    Casts screen columns in a multiprocessing pool, split into bands.
+    Workers attach to the world map (and distance field) through
+    multiprocessing.shared_memory once at startup; per frame only the
+    camera goes out and compact hit records come back.
+    Map edits after load are mirrored into shared memory before the next
+    frame. The occupancy mipmap is not shared, so 'mip' runs as 'sdf'
+    in the workers (same hits).
+    """
+    def __init__(self, world, workers=None, min_band=32):
+        self.world = world
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.min_band = min_band # Fewer columns per worker -> render in-process
+        self.pool = None
+        self.segments = {}
+        self.typecode = None
+        self.dirty = False
+        self.start()
+        world.map_listeners.append(self.on_cell_changed)
+
+    def _share(self, key, data):
+        seg = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        seg.buf[:len(data)] = data
+        self.segments[key] = seg
+
+    def start(self):
+        grid = self.world.world_map
+        cells = grid.cells
+        self.typecode = "B" if isinstance(cells, bytearray) else cells.typecode
+        self._share("cells", cells if self.typecode == "B" else cells.tobytes())
+        field = getattr(self.world, 'distance_field', None)
+        if field is not None:
+            self._share("dist", field.dist)
+        names = {key: seg.name for key, seg in self.segments.items()}
+        self.pool = Pool(self.workers, initializer=_worker_init,
+                         initargs=(names, grid.width, grid.height, self.typecode))
+        self.dirty = False
+
+    def on_cell_changed(self, x, y):
+        self.dirty = True
+
+    def sync(self):
+        """Mirror the map (and distance field) into shared memory."""
+        cells = self.world.world_map.cells
+        typecode = "B" if isinstance(cells, bytearray) else cells.typecode
+        if typecode != self.typecode:
+            # Cell storage was promoted: workers need new views
+            self.close_pool()
+            self.start()
+            return
+        data = cells if typecode == "B" else cells.tobytes()
+        self.segments["cells"].buf[:len(data)] = data
+        field = getattr(self.world, 'distance_field', None)
+        if field is not None and "dist" in self.segments:
+            self.segments["dist"].buf[:len(field.dist)] = field.dist
+        self.dirty = False
+
+    def should_use(self, width):
+        return self.pool is not None and width // self.workers >= self.min_band
+
+    def cast_frame(self, px, py, pa, width, fov, mode):
+        """Returns (records array('d'), iterations) for all columns."""
+        if self.dirty:
+            self.sync()
+        band = (width + self.workers - 1) // self.workers
+        tasks = [(x0, min(width, x0 + band), px, py, pa, width, fov, mode)
+                 for x0 in range(0, width, band)]
+        records = array('d')
+        iters = 0
+        for data, band_iters in self.pool.starmap(_cast_band, tasks):
+            records.frombytes(data)
+            iters += band_iters
+        return records, iters
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        for seg in self.segments.values():
+            seg.close()
+            seg.unlink()
+        self.segments = {}
+
+    def close(self):
+        self.close_pool()
+        if self.on_cell_changed in self.world.map_listeners:
+            self.world.map_listeners.remove(self.on_cell_changed)
@@ -0,0 +1,59 @@
+from array import array
+from time import perf_counter_ns
+
+class Profiler:
+    """
+    Per-stage timings (time.perf_counter_ns) kept in fixed-size ring
+    buffers, one per stage, for rolling stats over the last `size` frames.
+    While disabled nothing is timed: call() is a flag check plus the call.
+    """
+    def __init__(self, size=120, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.rings = {} # stage -> array('q') of ns samples
+        self.counts = {} # stage -> samples recorded so far
+        self.last = {} # stage -> last sample (ns)
+
+    def record(self, stage, ns):
+        ring = self.rings.get(stage)
+        if ring is None:
+            ring = self.rings[stage] = array('q', bytes(8 * self.size))
+            self.counts[stage] = 0
+        n = self.counts[stage]
+        ring[n % self.size] = ns
+        self.counts[stage] = n + 1
+        self.last[stage] = ns
+
+    def call(self, stage, fn, *args):
+        """fn(*args), timed under stage when enabled."""
+        if not self.enabled:
+            return fn(*args)
+        t0 = perf_counter_ns()
+        result = fn(*args)
+        self.record(stage, perf_counter_ns() - t0)
+        return result
+
+    def samples(self, stage):
+        """Recorded samples of a stage (ns, oldest first not guaranteed)."""
+        ring = self.rings.get(stage)
+        if ring is None:
+            return []
+        return ring[:min(self.counts[stage], self.size)].tolist()
+
+    def stats(self, stage):
+        """(last, mean, p95, max) in milliseconds over the ring."""
+        values = sorted(self.samples(stage))
+        if not values:
+            return 0.0, 0.0, 0.0, 0.0
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        return (self.last[stage] / 1e6, sum(values) / len(values) / 1e6,
+                p95 / 1e6, values[-1] / 1e6)
+
+    def last_ms(self):
+        """Last sample of every stage, in milliseconds."""
+        return {stage: ns / 1e6 for stage, ns in self.last.items()}
+
+    def reset(self):
+        self.rings.clear()
+        self.counts.clear()
+        self.last.clear()
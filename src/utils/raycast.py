@@ -0,0 +1,475 @@
+"""
+Grid ray traversal shared by the renderer and anything else that needs
+to walk a ray through the world map.
+
+All casters return (tex_id, map_x, map_y, side, iterations):
+- tex_id: value of the wall cell hit, 0 if the ray left the map or ran
+  out of steps
+- side: 0 if the last step crossed an X boundary, 1 for Y
+- iterations: loop iterations spent (cost metric)
+
+Side distances are evaluated as start + n * delta (not accumulated), so
+every caster reaches exactly the same hit cell and side for a ray.
+"""
+import math
+from functools import partial
+
+# Map is ~1000 wide. 60 was too short!
+MAX_DEPTH = 2000
+
+# Smallest free box radius worth a jump (short jumps cost more than steps)
+JUMP_MIN = 4
+
+def _ray_setup(px, py, ray_dir_x, ray_dir_y):
+    map_x, map_y = int(px), int(py)
+    delta_dist_x = abs(1 / ray_dir_x) if ray_dir_x != 0 else 1e30
+    delta_dist_y = abs(1 / ray_dir_y) if ray_dir_y != 0 else 1e30
+    step_x = -1 if ray_dir_x < 0 else 1
+    step_y = -1 if ray_dir_y < 0 else 1
+    side_x0 = (px - map_x) * delta_dist_x if ray_dir_x < 0 else (map_x + 1.0 - px) * delta_dist_x
+    side_y0 = (py - map_y) * delta_dist_y if ray_dir_y < 0 else (map_y + 1.0 - py) * delta_dist_y
+    return map_x, map_y, delta_dist_x, delta_dist_y, step_x, step_y, side_x0, side_y0
+
+def cast_ray_dda(grid, px, py, ray_dir_x, ray_dir_y, max_depth=MAX_DEPTH):
+    """Plain DDA: one cell per iteration."""
+    map_w, map_h, cells = grid.width, grid.height, grid.cells
+    map_x, map_y, dx, dy, step_x, step_y, sx0, sy0 = _ray_setup(px, py, ray_dir_x, ray_dir_y)
+    idx = map_y * map_w + map_x
+    row_step = step_y * map_w
+    nx = ny = 0
+    side_x, side_y = sx0, sy0
+    side = 0
+
+    for it in range(1, max_depth + 1):
+        if side_x < side_y:
+            nx += 1
+            side_x = sx0 + nx * dx
+            map_x += step_x
+            idx += step_x
+            side = 0
+        else:
+            ny += 1
+            side_y = sy0 + ny * dy
+            map_y += step_y
+            idx += row_step
+            side = 1
+
+        if 0 <= map_x < map_w and 0 <= map_y < map_h:
+            val = cells[idx]
+            if val > 0:
+                return val, map_x, map_y, side, it
+        else:
+            return 0, map_x, map_y, side, it
+    return 0, map_x, map_y, side, max_depth
+
+def _box_jump(nx, ny, ax, ay, sx0, sy0, dx, dy):
+    """
+    Exact DDA state after walking freely until the ray would take its
+    (ax + 1)-th further X step or (ay + 1)-th further Y step.
+    Returns (nx, ny, side) with nx/ny counting steps taken from the start.
+    Ordering matches the DDA: an X step goes first only if strictly earlier.
+    """
+    tx = sx0 + (nx + ax) * dx # Time of the first forbidden X step
+    ty = sy0 + (ny + ay) * dy # Time of the first forbidden Y step
+    if tx < ty:
+        # X limit first: take every Y step ordered before it
+        new_nx = nx + ax
+        j = ny + int(max(0.0, tx - (sy0 + ny * dy)) / dy) if dy < 1e30 else ny
+        while sy0 + j * dy <= tx:
+            j += 1
+        while j > ny and sy0 + (j - 1) * dy > tx:
+            j -= 1
+        new_ny = j
+    else:
+        # Y limit first: take every X step ordered before it
+        new_ny = ny + ay
+        i = nx + int(max(0.0, ty - (sx0 + nx * dx)) / dx) if dx < 1e30 else nx
+        while sx0 + i * dx < ty:
+            i += 1
+        while i > nx and sx0 + (i - 1) * dx >= ty:
+            i -= 1
+        new_nx = i
+
+    # Which of the two last steps came later in DDA order?
+    if new_ny == ny:
+        side = 0
+    elif new_nx == nx:
+        side = 1
+    else:
+        side = 1 if sx0 + (new_nx - 1) * dx < sy0 + (new_ny - 1) * dy else 0
+    return new_nx, new_ny, side
+
+def cast_ray_sdf(grid, dist_field, px, py, ray_dir_x, ray_dir_y, max_depth=MAX_DEPTH):
+    """
+    DDA with empty-space skipping. A cell at Chebyshev distance d from the
+    nearest wall has only empty cells within d - 1 around it, so the ray
+    jumps straight to where it leaves that box.
+    """
+    map_w, map_h, cells = grid.width, grid.height, grid.cells
+    dist = dist_field.dist
+    map_x, map_y, dx, dy, step_x, step_y, sx0, sy0 = _ray_setup(px, py, ray_dir_x, ray_dir_y)
+    start_x, start_y = map_x, map_y
+    idx = map_y * map_w + map_x
+    row_step = step_y * map_w
+    nx = ny = 0
+    side_x, side_y = sx0, sy0
+    side = 0
+    steps = 0
+    it = 0
+
+    # Start cell: may already be far from walls (never hit-tested, like DDA)
+    if 0 <= map_x < map_w and 0 <= map_y < map_h:
+        d = dist[idx]
+    else:
+        d = 0
+
+    while steps < max_depth:
+        it += 1
+        k = d - 1
+        if k >= JUMP_MIN and steps + 2 * k <= max_depth:
+            new_nx, new_ny, side = _box_jump(nx, ny, k, k, sx0, sy0, dx, dy)
+            steps += (new_nx - nx) + (new_ny - ny)
+            nx, ny = new_nx, new_ny
+            side_x = sx0 + nx * dx
+            side_y = sy0 + ny * dy
+            map_x = start_x + step_x * nx
+            map_y = start_y + step_y * ny
+            idx = map_y * map_w + map_x
+            d = dist[idx] # Inside the box: in the map and empty
+            continue
+
+        steps += 1
+        if side_x < side_y:
+            nx += 1
+            side_x = sx0 + nx * dx
+            map_x += step_x
+            idx += step_x
+            side = 0
+        else:
+            ny += 1
+            side_y = sy0 + ny * dy
+            map_y += step_y
+            idx += row_step
+            side = 1
+
+        if 0 <= map_x < map_w and 0 <= map_y < map_h:
+            d = dist[idx]
+            if d == 0: # Only wall cells have distance 0
+                return cells[idx], map_x, map_y, side, it
+        else:
+            return 0, map_x, map_y, side, it
+    return 0, map_x, map_y, side, it
+
+def cast_ray_mip(grid, mip, px, py, ray_dir_x, ray_dir_y, max_depth=MAX_DEPTH):
+    """
+    Hierarchical traversal over an OccupancyMip. Inside a block with no
+    walls the ray jumps to the block's exit at the coarsest empty level,
+    and only steps cell by cell in blocks that contain geometry.
+    """
+    map_w, map_h, cells = grid.width, grid.height, grid.cells
+    map_x, map_y, dx, dy, step_x, step_y, sx0, sy0 = _ray_setup(px, py, ray_dir_x, ray_dir_y)
+    start_x, start_y = map_x, map_y
+    idx = map_y * map_w + map_x
+    row_step = step_y * map_w
+    nx = ny = 0
+    side_x, side_y = sx0, sy0
+    side = 0
+    steps = 0
+    it = 0
+
+    levels = mip.coarse_to_fine
+    fine_w, fine_shift = levels[-1][1], levels[-1][2]
+    solid_block = -1 # Finest block known to contain walls (no re-check)
+
+    while steps < max_depth:
+        it += 1
+        if 0 <= map_x < map_w and 0 <= map_y < map_h:
+            fine_block = (map_y >> fine_shift) * fine_w + (map_x >> fine_shift)
+            if fine_block != solid_block:
+                jump = None
+                for occupancy, blocks_w, shift, size in levels:
+                    bx = map_x >> shift
+                    by = map_y >> shift
+                    if occupancy[by * blocks_w + bx]:
+                        continue # Geometry in this block, try a finer level
+                    # Steps left inside the (map-clipped) block along each axis
+                    if step_x > 0:
+                        ax = min((bx + 1) * size, map_w) - 1 - map_x
+                    else:
+                        ax = map_x - bx * size
+                    if step_y > 0:
+                        ay = min((by + 1) * size, map_h) - 1 - map_y
+                    else:
+                        ay = map_y - by * size
+                    if ax + ay >= JUMP_MIN and steps + ax + ay <= max_depth:
+                        jump = _box_jump(nx, ny, ax, ay, sx0, sy0, dx, dy)
+                    break
+                else:
+                    solid_block = fine_block
+
+                if jump is not None and (jump[0] != nx or jump[1] != ny):
+                    steps += (jump[0] - nx) + (jump[1] - ny)
+                    nx, ny, side = jump
+                    side_x = sx0 + nx * dx
+                    side_y = sy0 + ny * dy
+                    map_x = start_x + step_x * nx
+                    map_y = start_y + step_y * ny
+                    idx = map_y * map_w + map_x
+                    continue
+
+        # Single cell step (also leaves an empty block we sit at the edge of)
+        steps += 1
+        if side_x < side_y:
+            nx += 1
+            side_x = sx0 + nx * dx
+            map_x += step_x
+            idx += step_x
+            side = 0
+        else:
+            ny += 1
+            side_y = sy0 + ny * dy
+            map_y += step_y
+            idx += row_step
+            side = 1
+
+        if 0 <= map_x < map_w and 0 <= map_y < map_h:
+            val = cells[idx]
+            if val > 0:
+                return val, map_x, map_y, side, it
+        else:
+            return 0, map_x, map_y, side, it
+    return 0, map_x, map_y, side, it
+
+# Runtime-selectable traversal engines (see select_caster)
+RAYCAST_MODES = ("auto", "dda", "sdf", "mip")
+
+# 'auto' picks sdf when at least this fraction of the empty cells allows a
+# jump. On cluttered maps (about a third) the distance lookups on every
+# step cost more than the jumps save, and plain DDA is faster.
+SDF_MIN_OPEN = 0.5
+
+def auto_mode(world):
+    """Fastest engine for the loaded map ('sdf' or 'dda'), decided once per field."""
+    field = getattr(world, 'distance_field', None)
+    if field is None:
+        return "dda"
+    mode = field.auto_mode
+    if mode is None:
+        # Cells whose free box is big enough for a jump (see cast_ray_sdf)
+        mode = field.auto_mode = "sdf" if field.open_fraction(JUMP_MIN) >= SDF_MIN_OPEN else "dda"
+    return mode
+
+def select_caster(world, mode):
+    """
+    Returns (cast, mode_used) where cast(px, py, ray_dir_x, ray_dir_y[, max_depth])
+    uses the requested engine ('auto': see auto_mode), falling back to
+    plain DDA when the acceleration structure it needs has not been built.
+    """
+    grid = world.world_map
+    if mode == "auto":
+        mode = auto_mode(world)
+    if mode == "sdf" and getattr(world, 'distance_field', None) is not None:
+        return partial(cast_ray_sdf, grid, world.distance_field), "sdf"
+    if mode == "mip" and getattr(world, 'occupancy_mip', None) is not None:
+        return partial(cast_ray_mip, grid, world.occupancy_mip), "mip"
+    return partial(cast_ray_dda, grid), "dda"
+
+# Per-column hit record layout (flat array('d'), RECORD_SIZE values per column)
+RECORD_SIZE = 4 # distance, side_flags, tex_id, wall_x
+FLAG_FLIP = 2   # side_flags bit: texture runs mirrored on this face
+
+def cast_columns(cast, dirs_x, dirs_y, fisheye, px, py, x0, x1, out):
+    """
+    Casts screen columns [x0, x1) and appends one hit record per column
+    to out (array('d')):
+    - distance: fisheye-corrected perpendicular distance (>= 0.1)
+    - side_flags: side (0/1) | FLAG_FLIP
+    - tex_id: wall cell value, 0 = no hit (other fields are then 0)
+    - wall_x: hit position along the wall face, in [0, 1)
+    Returns the traversal iterations spent.
+    """
+    iters_total = 0
+    for x in range(x0, x1):
+        ray_dir_x = dirs_x[x]
+        ray_dir_y = dirs_y[x]
+        tex_id, map_x, map_y, side, iters = cast(px, py, ray_dir_x, ray_dir_y)
+        iters_total += iters
+        if tex_id <= 0:
+            out.extend((0.0, 0.0, 0.0, 0.0))
+            continue
+
+        # Perpendicular distance
+        if side == 0:
+            step_x = -1 if ray_dir_x < 0 else 1
+            perp_wall_dist = (map_x - px + (1 - step_x) / 2) / ray_dir_x
+        else:
+            step_y = -1 if ray_dir_y < 0 else 1
+            perp_wall_dist = (map_y - py + (1 - step_y) / 2) / ray_dir_y
+
+        # Correction for fisheye
+        # We use rayDir directly (no camera plane), so scale by
+        # cos(pa - ray_angle), cached per column in the ray table.
+        perp_wall_dist *= fisheye[x]
+        if perp_wall_dist < 0.1: perp_wall_dist = 0.1
+
+        # Wall X (Texture Mapping)
+        if side == 0:
+            wall_x = py + perp_wall_dist * ray_dir_y
+            flip = ray_dir_x > 0
+        else:
+            wall_x = px + perp_wall_dist * ray_dir_x
+            flip = ray_dir_y < 0
+        wall_x -= math.floor(wall_x)
+
+        out.extend((perp_wall_dist, side | (FLAG_FLIP if flip else 0), tex_id, wall_x))
+    return iters_total
+
+# ----------------------------------------------------------------------
+# Segment queries (World.raycast)
+# ----------------------------------------------------------------------
+# Query masks: what a ray stops at / reports
+RAY_WALLS = 1
+RAY_BODIES = 2 # Entities in the spatial hash (Transform + Body)
+RAY_ALL = RAY_WALLS | RAY_BODIES
+
+def cast_segment(cast, px, py, dir_x, dir_y, max_dist):
+    """
+    First wall along the ray from (px, py) with unit direction (dir_x,
+    dir_y) within max_dist, using a caster from select_caster().
+    Returns (dist, tex_id, map_x, map_y, side); tex_id is 0 and dist is
+    max_dist when nothing was hit.
+    """
+    # A segment of length L crosses at most L * (|dx| + |dy|) + 2 cell edges
+    max_steps = min(MAX_DEPTH, int(max_dist * (abs(dir_x) + abs(dir_y))) + 2)
+    tex_id, map_x, map_y, side, _ = cast(px, py, dir_x, dir_y, max_steps)
+    if tex_id <= 0:
+        return max_dist, 0, map_x, map_y, side
+    # Distance to the crossed cell edge (as the renderer's, before fisheye)
+    if side == 0:
+        dist = (map_x - px + (0 if dir_x > 0 else 1)) / dir_x
+    else:
+        dist = (map_y - py + (0 if dir_y > 0 else 1)) / dir_y
+    if dist > max_dist:
+        return max_dist, 0, map_x, map_y, side
+    return dist, tex_id, map_x, map_y, side
+
+# ----------------------------------------------------------------------
+# Swept circle vs grid (continuous collision)
+# ----------------------------------------------------------------------
+def _toi_cell(px, py, dx, dy, r, x0, y0):
+    """
+    First contact of a circle of radius r moving from (px, py) by
+    (dx, dy) with the unit cell at (x0, y0): the earliest hit on the
+    cell grown by r (four flat faces, four rounded corners).
+    Returns (t, normal_x, normal_y) with t in [0, 1], or None.
+    A circle that already overlaps the cell hits at t = 0 if it is
+    moving further in, and passes otherwise (so it can slide out).
+    """
+    x1, y1 = x0 + 1.0, y0 + 1.0
+    # Already overlapping?
+    qx = x0 if px < x0 else (x1 if px > x1 else px)
+    qy = y0 if py < y0 else (y1 if py > y1 else py)
+    ox, oy = px - qx, py - qy
+    d2 = ox * ox + oy * oy
+    if d2 < r * r:
+        if d2 > 0.0:
+            d = math.sqrt(d2)
+            nx, ny = ox / d, oy / d
+        else:
+            # Center inside the cell: push out through the nearest face
+            nx, ny, depth = -1.0, 0.0, px - x0
+            if x1 - px < depth: nx, ny, depth = 1.0, 0.0, x1 - px
+            if py - y0 < depth: nx, ny, depth = 0.0, -1.0, py - y0
+            if y1 - py < depth: nx, ny = 0.0, 1.0
+        return (0.0, nx, ny) if dx * nx + dy * ny < 0.0 else None
+
+    best = None
+    # Faces
+    if dx > 0.0:
+        t = (x0 - r - px) / dx
+        if 0.0 <= t <= 1.0 and y0 <= py + t * dy <= y1:
+            best = (t, -1.0, 0.0)
+    elif dx < 0.0:
+        t = (x1 + r - px) / dx
+        if 0.0 <= t <= 1.0 and y0 <= py + t * dy <= y1:
+            best = (t, 1.0, 0.0)
+    if dy > 0.0:
+        t = (y0 - r - py) / dy
+        if 0.0 <= t <= 1.0 and x0 <= px + t * dx <= x1 and (best is None or t < best[0]):
+            best = (t, 0.0, -1.0)
+    elif dy < 0.0:
+        t = (y1 + r - py) / dy
+        if 0.0 <= t <= 1.0 and x0 <= px + t * dx <= x1 and (best is None or t < best[0]):
+            best = (t, 0.0, 1.0)
+    # Corners
+    a = dx * dx + dy * dy
+    for cx, cy in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+        fx, fy = px - cx, py - cy
+        b = fx * dx + fy * dy
+        if b >= 0.0: continue # Moving away from this corner
+        disc = b * b - a * (fx * fx + fy * fy - r * r)
+        if disc < 0.0: continue
+        t = (-b - math.sqrt(disc)) / a
+        if 0.0 <= t <= 1.0 and (best is None or t < best[0]):
+            best = (t, (fx + t * dx) / r, (fy + t * dy) / r)
+    return best
+
+def sweep_circle(grid, px, py, dx, dy, radius):
+    """
+    Time of impact of a circle of `radius` moving from (px, py) by
+    (dx, dy) against solid cells (cells outside the map count as solid).
+    Short moves test the solid cells under the swept bounding box. Long
+    ones walk the cells under the center with DDA, test the solid cells
+    around each, and stop once the next cell is entered after the best
+    hit so far, so the cost follows the distance actually travelled.
+    Returns (t, normal_x, normal_y) with t in [0, 1], or None.
+    """
+    map_w, map_h, cells = grid.width, grid.height, grid.cells
+    # Short moves: test the solid cells under the swept bounding box
+    x0 = math.floor(min(px, px + dx) - radius)
+    x1 = math.floor(max(px, px + dx) + radius)
+    y0 = math.floor(min(py, py + dy) - radius)
+    y1 = math.floor(max(py, py + dy) + radius)
+    if (x1 - x0 + 1) * (y1 - y0 + 1) <= 25:
+        best = None
+        for cy in range(y0, y1 + 1):
+            row_ok = 0 <= cy < map_h
+            for cx in range(x0, x1 + 1):
+                if row_ok and 0 <= cx < map_w and cells[cy * map_w + cx] <= 0:
+                    continue
+                hit = _toi_cell(px, py, dx, dy, radius, cx, cy)
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = hit
+        return best
+
+    # Long moves: walk the cells under the center
+    reach = int(math.ceil(radius))
+    map_x, map_y = math.floor(px), math.floor(py)
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # t at which the center crosses the next X / Y cell boundary
+    delta_x = abs(1.0 / dx) if dx != 0 else math.inf
+    delta_y = abs(1.0 / dy) if dy != 0 else math.inf
+    next_x = ((map_x + 1.0 - px) if dx > 0 else (px - map_x)) * delta_x if dx != 0 else math.inf
+    next_y = ((map_y + 1.0 - py) if dy > 0 else (py - map_y)) * delta_y if dy != 0 else math.inf
+    tested = set()
+    best = None
+    while True:
+        for cy in range(map_y - reach, map_y + reach + 1):
+            for cx in range(map_x - reach, map_x + reach + 1):
+                if (cx, cy) in tested: continue
+                tested.add((cx, cy))
+                if 0 <= cx < map_w and 0 <= cy < map_h and cells[cy * map_w + cx] <= 0:
+                    continue
+                hit = _toi_cell(px, py, dx, dy, radius, cx, cy)
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = hit
+        t_next = next_x if next_x < next_y else next_y
+        if t_next > 1.0 or (best is not None and t_next > best[0]):
+            return best
+        if next_x < next_y:
+            map_x += step_x
+            next_x += delta_x
+        else:
+            map_y += step_y
+            next_y += delta_y
@@ -0,0 +1,178 @@
+from math import floor, sqrt
+
+# Cell key: cy * CELL_STRIDE + cx (one int; neighbours are key + offset).
+# The default cell size is one map cell.
+CELL_STRIDE = 1 << 21
+
+class SpatialHash:
+    """
+    Uniform-grid broadphase for entity bodies: a circle of `radius` in XY
+    and the vertical extent [z, z + height]. Each body is filed under the
+    cell holding its center; queries widen their search by the largest
+    radius seen, so bodies bigger than a cell are still found.
+    update() only touches the cell index when a body moves to another cell.
+    """
+    def __init__(self, cell_size=1.0):
+        self.cell_size = cell_size
+        self.inv_cell = 1.0 / cell_size
+        self.cells = {} # cell key -> {entity id: None}
+        self.bodies = {} # entity id -> (x, y, z, radius, height)
+        self.where = {} # entity id -> cell key
+        self.max_radius = 0.0
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.bodies
+
+    def cell_key(self, x, y):
+        return floor(y * self.inv_cell) * CELL_STRIDE + floor(x * self.inv_cell)
+
+    def update(self, entity_id, x, y, z, radius, height):
+        """Insert or move a body."""
+        key = floor(y * self.inv_cell) * CELL_STRIDE + floor(x * self.inv_cell)
+        old = self.where.get(entity_id)
+        if old != key:
+            if old is not None:
+                cell = self.cells[old]
+                del cell[entity_id]
+                if not cell:
+                    del self.cells[old]
+            self.cells.setdefault(key, {})[entity_id] = None
+            self.where[entity_id] = key
+        self.bodies[entity_id] = (x, y, z, radius, height)
+        if radius > self.max_radius:
+            self.max_radius = radius
+
+    def remove(self, entity_id):
+        key = self.where.pop(entity_id, None)
+        if key is None: return
+        del self.bodies[entity_id]
+        cell = self.cells[key]
+        del cell[entity_id]
+        if not cell:
+            del self.cells[key]
+
+    def clear(self):
+        self.cells.clear()
+        self.bodies.clear()
+        self.where.clear()
+        self.max_radius = 0.0
+
+    def _candidates(self, min_x, min_y, max_x, max_y):
+        """Ids filed in cells overlapping the box grown by max_radius."""
+        inv = self.inv_cell
+        pad = self.max_radius
+        cx0, cx1 = floor((min_x - pad) * inv), floor((max_x + pad) * inv)
+        cy0, cy1 = floor((min_y - pad) * inv), floor((max_y + pad) * inv)
+        cells = self.cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            # Huge query: walk the occupied cells instead
+            half = CELL_STRIDE // 2
+            for key, ids in cells.items():
+                cy, cx = divmod(key + half, CELL_STRIDE)
+                if cx0 <= cx - half <= cx1 and cy0 <= cy <= cy1:
+                    yield from ids
+            return
+        for cy in range(cy0, cy1 + 1):
+            row = cy * CELL_STRIDE
+            for key in range(row + cx0, row + cx1 + 1):
+                ids = cells.get(key)
+                if ids:
+                    yield from ids
+
+    def query_radius(self, x, y, radius):
+        """Ids whose body circle overlaps the circle (x, y, radius), sorted."""
+        bodies = self.bodies
+        found = []
+        for e in self._candidates(x - radius, y - radius, x + radius, y + radius):
+            bx, by, _, br, _ = bodies[e]
+            dx, dy, reach = bx - x, by - y, br + radius
+            if dx * dx + dy * dy < reach * reach:
+                found.append(e)
+        found.sort()
+        return found
+
+    def query_aabb(self, min_x, min_y, max_x, max_y):
+        """Ids whose body circle overlaps the box, sorted."""
+        bodies = self.bodies
+        found = []
+        for e in self._candidates(min_x, min_y, max_x, max_y):
+            bx, by, _, br, _ = bodies[e]
+            # Closest point of the box to the body center
+            dx = bx - (min_x if bx < min_x else (max_x if bx > max_x else bx))
+            dy = by - (min_y if by < min_y else (max_y if by > max_y else by))
+            if dx * dx + dy * dy < br * br:
+                found.append(e)
+        found.sort()
+        return found
+
+    def query_ray(self, x, y, dir_x, dir_y, max_dist):
+        """
+        (distance, id) of bodies whose circle the ray from (x, y) with unit
+        direction (dir_x, dir_y) enters within max_dist, nearest first
+        (distance 0 when it starts inside). The ray is walked in short
+        pieces so only cells near it are looked at.
+        """
+        bodies = self.bodies
+        if not bodies: return []
+        piece = 4.0 * self.cell_size
+        seen = set()
+        hits = []
+        t0 = 0.0
+        while t0 < max_dist:
+            t1 = min(max_dist, t0 + piece)
+            ax, ay = x + dir_x * t0, y + dir_y * t0
+            bx, by = x + dir_x * t1, y + dir_y * t1
+            for e in self._candidates(min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)):
+                if e in seen: continue
+                seen.add(e)
+                cx, cy, _, r, _ = bodies[e]
+                # |(x, y) + t * dir - (cx, cy)| = r
+                ox, oy = x - cx, y - cy
+                b = ox * dir_x + oy * dir_y
+                c = ox * ox + oy * oy - r * r
+                if c < 0:
+                    hits.append((0.0, e))
+                    continue
+                disc = b * b - c
+                if b >= 0 or disc < 0:
+                    continue # Pointing away, or passing by
+                t = -b - sqrt(disc)
+                if t <= max_dist:
+                    hits.append((t, e))
+            t0 = t1
+        hits.sort()
+        return hits
+
+    def contact_pairs(self):
+        """
+        Sorted (a, b) pairs, a < b, of bodies whose circles overlap in XY
+        and whose vertical extents overlap. Each cell is tested against
+        itself and the forward half of its neighbourhood, so every pair
+        is visited once.
+        """
+        reach = int(2.0 * self.max_radius * self.inv_cell) + 1
+        forward = [dy * CELL_STRIDE + dx for dy in range(0, reach + 1) for dx in range(-reach, reach + 1)
+                   if dy > 0 or dx > 0]
+        cells = self.cells
+        get = cells.get
+        bodies = self.bodies
+        pairs = []
+        for key, ids in cells.items():
+            near = [e for offset in forward for e in get(key + offset, ())]
+            if not near and len(ids) == 1:
+                continue # Lone body, empty neighbourhood
+            own = list(ids)
+            others = own + near
+            for i, a in enumerate(own):
+                ax, ay, az, ar, ah = bodies[a]
+                for j in range(i + 1, len(others)):
+                    b = others[j]
+                    bx, by, bz, br, bh = bodies[b]
+                    ddx, ddy, rr = bx - ax, by - ay, ar + br
+                    if ddx * ddx + ddy * ddy < rr * rr and az < bz + bh and bz < az + ah:
+                        pairs.append((a, b) if a < b else (b, a))
+        pairs.sort()
+        return pairs
@@ -0,0 +1,42 @@
+from array import array
+from collections import OrderedDict
+
+class StripCache:
+    """
+    LRU cache of composed wall column strips.
+    A strip is an array('I') of glyph codepoints, top to bottom, ready to
+    be written into a FrameBuffer column with one slice assignment.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.strips = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Strip for key, calling build(*key) on a miss."""
+        strip = self.strips.get(key)
+        if strip is not None:
+            self.hits += 1
+            self.strips.move_to_end(key)
+            return strip
+        self.misses += 1
+        strip = self.strips[key] = build(*key)
+        if len(self.strips) > self.maxsize:
+            self.strips.popitem(last=False)
+        return strip
+
+    def clear(self):
+        self.strips.clear()
+
+def glyph_strip(char, height, alt_char=None, alt_parity=0):
+    """
+    height cells of char. With alt_char, every row i where
+    (i + alt_parity) is even uses alt_char instead.
+    """
+    strip = array("I", [ord(char)]) * height
+    if alt_char is not None and height:
+        first = alt_parity % 2
+        n = (height - first + 1) // 2
+        strip[first::2] = array("I", [ord(alt_char)]) * n
+    return strip
@@ -0,0 +1,207 @@
+import os
+import sys
+import threading
+import time
+from src.utils.frame_buffer import FrameBuffer
+
+# Cells closer than this are sent as one run (a cursor jump costs ~8 bytes)
+MERGE_GAP = 3
+
+class TerminalWriter:
+    """
+    Delta-encoding output stage.
+    Keeps a snapshot of the previously emitted frame and only sends runs
+    of changed cells (encoded by FrameBuffer.to_bytes). Falls back to a
+    full repaint when too much of the screen changed.
+    """
+    def __init__(self, width, height, full_repaint_ratio=0.5, stream=None):
+        self.width = width
+        self.height = height
+        self.full_repaint_ratio = full_repaint_ratio # Fraction of changed cells
+        self.stream = stream # None = sys.stdout's binary buffer
+        self.prev = FrameBuffer(width, height) # Last frame actually sent
+        self.prev_valid = False # False = unknown screen contents
+
+        # Stats (same names as ThreadedTerminalWriter; nothing is ever dropped)
+        self.last_frame_bytes = 0
+        self.last_frame_full = False
+        self.total_bytes = 0
+        self.frames = 0
+        self.dropped = 0
+        self.last_write_latency = 0.0 # Seconds from write() to flush done
+        self.max_write_latency = 0.0
+        self.input_latencies = [] # Seconds, input arrival -> flush done
+
+    def invalidate(self):
+        """Forget the terminal contents (screen cleared / resized)."""
+        self.prev_valid = False
+
+    def take_input_latencies(self):
+        """Input latencies measured since the last call (oldest first)."""
+        latencies, self.input_latencies = self.input_latencies, []
+        return latencies
+
+    def encode(self, fb):
+        """Encode the frame buffer as the shortest update for the terminal."""
+        full = not self.prev_valid
+        if not full:
+            runs, changed = fb.diff_runs(self.prev, MERGE_GAP)
+            if changed > self.full_repaint_ratio * self.width * self.height:
+                full = True
+
+        data = fb.to_bytes() if full else fb.to_bytes(runs)
+
+        self.prev.copy_from(fb)
+        self.prev_valid = True
+        self.last_frame_full = full
+        return data
+
+    def write(self, fb, input_arrival=None):
+        """
+        Encode, write and flush. input_arrival: perf_counter() time of the
+        earliest input this frame shows. Returns bytes written.
+        """
+        submitted = time.perf_counter()
+        data = self.encode(fb)
+        stream = self.stream if self.stream is not None else sys.stdout.buffer
+        if data:
+            stream.write(data)
+        stream.flush()
+
+        written = time.perf_counter()
+        self.last_write_latency = written - submitted
+        if self.last_write_latency > self.max_write_latency:
+            self.max_write_latency = self.last_write_latency
+        if input_arrival is not None:
+            self.input_latencies.append(written - input_arrival)
+        self.last_frame_bytes = len(data)
+        self.total_bytes += len(data)
+        self.frames += 1
+        return len(data)
+
+class ThreadedTerminalWriter:
+    """
+    TerminalWriter on a background thread that owns the output fd.
+    write() snapshots the frame into a single-slot mailbox and returns at
+    once. The thread delta-encodes the newest snapshot against the last
+    frame it actually wrote and sends it with os.write, so when the
+    terminal is slower than the game, stale frames are dropped instead
+    of stalling the loop, and the delta never skips a frame.
+    A frame may carry the arrival time of the input it shows; the thread
+    measures input latency when that frame's os.write has returned (a
+    dropped frame hands its arrival time on to the one replacing it).
+    """
+    def __init__(self, width, height, full_repaint_ratio=0.5, fd=None):
+        self.encoder = TerminalWriter(width, height, full_repaint_ratio)
+        self.fd = fd if fd is not None else sys.stdout.fileno()
+        # Three snapshots: one being filled, one in the mailbox, one being written
+        self.free = [FrameBuffer(width, height) for _ in range(3)]
+        self.slot = None # (snapshot, submit time, input arrival or None)
+        self.busy = False # Thread is encoding/writing
+        self.cond = threading.Condition()
+        self.closing = False
+        self.invalidate_pending = False
+
+        # Stats (last_frame_* describe the last frame actually written)
+        self.last_frame_bytes = 0
+        self.last_frame_full = False
+        self.total_bytes = 0
+        self.frames = 0 # Frames written
+        self.dropped = 0 # Frames replaced in the mailbox before being written
+        self.last_write_latency = 0.0 # Seconds from write() to os.write done
+        self.max_write_latency = 0.0
+        self.input_latencies = [] # Seconds, input arrival -> os.write done (see take_input_latencies)
+
+        self.thread = threading.Thread(target=self._run, name="terminal-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def full_repaint_ratio(self):
+        return self.encoder.full_repaint_ratio
+
+    @full_repaint_ratio.setter
+    def full_repaint_ratio(self, value):
+        self.encoder.full_repaint_ratio = value
+
+    def invalidate(self):
+        """Forget the terminal contents (applied before the next encode)."""
+        with self.cond:
+            self.invalidate_pending = True
+
+    def write(self, fb, input_arrival=None):
+        """
+        Queue a copy of fb for output. input_arrival: perf_counter() time of
+        the earliest input this frame shows. Returns the size of the last
+        written frame.
+        """
+        with self.cond:
+            snap = self.free.pop()
+        snap.copy_from(fb)
+        with self.cond:
+            if self.slot is not None:
+                self.dropped += 1
+                self.free.append(self.slot[0])
+                if self.slot[2] is not None and (input_arrival is None or self.slot[2] < input_arrival):
+                    input_arrival = self.slot[2]
+            self.slot = (snap, time.perf_counter(), input_arrival)
+            self.cond.notify_all()
+        return self.last_frame_bytes
+
+    def take_input_latencies(self):
+        """Input latencies measured since the last call (oldest first)."""
+        with self.cond:
+            latencies, self.input_latencies = self.input_latencies, []
+        return latencies
+
+    def flush(self, timeout=None):
+        """Wait until every queued frame has been written."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.slot is None and not self.busy, timeout)
+
+    def close(self):
+        """Write the pending frame, then stop the thread."""
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        while view:
+            n = os.write(self.fd, view)
+            view = view[n:]
+
+    def _run(self):
+        cond = self.cond
+        while True:
+            with cond:
+                cond.wait_for(lambda: self.slot is not None or self.closing)
+                if self.slot is None:
+                    return
+                snap, submitted, input_arrival = self.slot
+                self.slot = None
+                self.busy = True
+                if self.invalidate_pending:
+                    self.invalidate_pending = False
+                    self.encoder.invalidate()
+            try:
+                data = self.encoder.encode(snap)
+                if data:
+                    self._write_all(data)
+            except OSError:
+                data = b"" # Terminal gone: keep draining so the game can exit
+            written = time.perf_counter()
+            latency = written - submitted
+            with cond:
+                self.free.append(snap)
+                self.busy = False
+                self.last_frame_bytes = len(data)
+                self.last_frame_full = self.encoder.last_frame_full
+                self.total_bytes += len(data)
+                self.frames += 1
+                self.last_write_latency = latency
+                if latency > self.max_write_latency:
+                    self.max_write_latency = latency
+                if input_arrival is not None:
+                    self.input_latencies.append(written - input_arrival)
+                cond.notify_all()